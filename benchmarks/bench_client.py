@@ -0,0 +1,78 @@
+"""
+Throughput and resilience of FakturoidProcessor against the local Fakturoid stand-in server.
+
+Usage:
+    python bench_client.py --documents 10000 --latency 0.05 --error-rate 0.02 --workers 1 4 8
+"""
+import argparse
+import sys
+import time
+from dataclasses import replace
+from typing import Dict
+
+sys.path.append("..")
+sys.path.append("../src")
+
+from fakturoid_server import ServerOptions, serve  # noqa: E402
+from ledger_generator import SLUG, generate_ledger  # noqa: E402
+from src.dtos import Period  # noqa: E402
+from src.fakturoid_processor import FakturoidAuth, FakturoidProcessor  # noqa: E402
+
+
+def run(base_url: str, workers: int, period: Period, retries: int, backoff: float,
+        rate_limited: bool = False) -> Dict[str, float]:
+    """
+    Fetches invoices and expenses of the period with a fresh processor.
+    :param base_url:
+    :param workers:
+    :param period:
+    :param retries:
+    :param backoff:
+    :param rate_limited: whether the processor follows the rate limit headers, otherwise only fetching is measured
+    :return: seconds and number of fetched documents
+    """
+    processor = FakturoidProcessor(FakturoidAuth("client_id", "client_secret", "user@example.org", SLUG),
+                                   workers=workers, retries=retries, backoff=backoff, base_url=base_url,
+                                   rate_limited=rate_limited)
+    started = time.perf_counter()
+    invoices = processor.process_invoices(period)
+    expenses = processor.process_expenses(period)
+    return {"seconds": time.perf_counter() - started, "documents": len(invoices) + len(expenses)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetches a synthetic ledger from the local Fakturoid stand-in.")
+    parser.add_argument("--documents", type=int, default=2000, help="number of invoices and of expenses")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="processor workers to compare")
+    parser.add_argument("--page-size", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--latency-jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--rate-window", type=float, default=60)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=0.1)
+    parser.add_argument("--rate-limiter", action="store_true",
+                        help="follow the rate limit headers, otherwise 429s of --rate-limit are only retried")
+    args = parser.parse_args()
+
+    invoices, expenses = generate_ledger(args.documents)
+    options = ServerOptions(page_size=args.page_size, latency=args.latency, latency_jitter=args.latency_jitter,
+                            error_rate=args.error_rate, rate_limit=args.rate_limit, rate_window=args.rate_window)
+
+    print(f"{'workers':>8} {'seconds':>10} {'docs/s':>10} {'documents':>10}  responses")
+    for workers in args.workers:
+        with serve(invoices, expenses, replace(options)) as server:
+            try:
+                result = run(server.base_url, workers, Period(2023, 6), args.retries, args.backoff,
+                             args.rate_limiter)
+            except Exception as ex:
+                print(f"{workers:>8} failed: {type(ex).__name__}: {ex}")
+                continue
+            responses = ", ".join(f"{status}: {count}" for status, count in sorted(server.counters.items()))
+            print(f"{workers:>8} {result['seconds']:>10.3f} {result['documents'] / result['seconds']:>10.0f} "
+                  f"{result['documents']:>10}  {responses}")
+
+
+if __name__ == "__main__":
+    main()
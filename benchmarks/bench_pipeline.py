@@ -0,0 +1,185 @@
+"""
+End-to-end pipeline benchmark on a synthetic ledger, every stage is timed separately, HTTP is mocked.
+
+Usage:
+    python bench_pipeline.py --sizes 100 1000 10000 --save baselines/local.json
+    python bench_pipeline.py --sizes 100 1000 10000 --compare baselines/local.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+sys.path.append("..")
+sys.path.append("../src")
+
+from ledger_generator import generate_config, generate_ledger  # noqa: E402
+from src.atomic_files import write_atomically  # noqa: E402
+from src.dtos import Period  # noqa: E402
+from src.fakturoid_processor import FakturoidProcessor  # noqa: E402
+from src.generator import get_report_dir_name, save_qr_code, validate_vat_numbers  # noqa: E402
+from src.ledger import compute_control_report  # noqa: E402
+from src.manifest import MANIFEST_FILE_NAME  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.template_engine import get_template_env  # noqa: E402
+from src.vat_registry import get_client_vat_registry, get_supplier_vat_registry  # noqa: E402
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000]
+STAGES = ["fetch", "period_filter", "transform", "vat_validation", "totals", "control_report", "render_dphdp3",
+          "render_dphkh1", "write", "qr"]
+
+
+def run(size: int, repeat: int) -> Dict[str, float]:
+    """
+    Best time in seconds of each stage for a ledger of size invoices and size expenses.
+    :param size:
+    :param repeat:
+    :return:
+    """
+    timings: Dict[str, float] = {}
+
+    def timed(stage: str, action: Callable, setup: Optional[Callable] = None):
+        best = None
+        result = None
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            result = action()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[stage] = best
+        return result
+
+    raw_invoices, raw_expenses = generate_ledger(size)
+    period = Period(2023, 6)
+
+    with tempfile.TemporaryDirectory() as output, _mocked_fakturoid(raw_invoices, raw_expenses):
+        config = generate_config(output)
+        processor = FakturoidProcessor.from_config(config)
+
+        fetched = timed("fetch", lambda: (list(processor._iter_documents(processor._auth, "invoices.json", period, period)),
+                                          list(processor._iter_documents(processor._auth, "expenses.json", period, period))))
+        in_period = timed("period_filter", lambda: tuple(
+            [d for d in documents if FakturoidProcessor._is_in_periods(d, period, period)] for documents in fetched))
+        invoices, expenses = timed("transform", lambda: (FakturoidProcessor.transform_invoices(in_period[0]),
+                                                         FakturoidProcessor.transform_expenses(in_period[1])))
+        client_vat_registry = get_client_vat_registry(config)
+        supplier_vat_registry = get_supplier_vat_registry(config)
+        timed("vat_validation",
+              lambda: validate_vat_numbers(invoices, expenses, client_vat_registry, supplier_vat_registry))
+        totals = timed("totals", lambda: Processor.generate_totals(invoices, expenses))
+        control_report = timed("control_report", lambda: compute_control_report(invoices, expenses))
+
+        env = get_template_env()
+        context = dict(invoices=invoices, expenses=expenses, totals=totals, control_report=control_report,
+                       period=period, env=os.environ, signed_on="21.07.2023", user=config.user, account=config.account)
+        dphdp3 = timed("render_dphdp3", lambda: list(env.get_template("dphdp3_template.xml").generate(context)))
+        dphkh1 = timed("render_dphkh1", lambda: list(env.get_template("dphkh1_template.xml").generate(context)))
+        timed("write", lambda: (write_atomically(os.path.join(output, "dphdp3.xml"), dphdp3),
+                                write_atomically(os.path.join(output, "dphkh1.xml"), dphkh1)))
+        timed("qr", lambda: save_qr_code(config, totals), setup=lambda: _remove_manifest(config))
+
+    return timings
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float,
+            min_seconds: float) -> List[str]:
+    """
+    Stages slower than the baseline by more than the threshold ratio and more than min_seconds.
+    :param results:
+    :param baseline:
+    :param threshold: e.g., 0.25 flags stages more than 25 % slower
+    :param min_seconds: absolute noise floor
+    :return: descriptions of regressions
+    """
+    regressions = []
+    for size, timings in results.items():
+        for stage, seconds in timings.items():
+            before = baseline.get(size, {}).get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + threshold) and seconds - before > min_seconds:
+                regressions.append(f"{stage} at {size} records: {before:.4f} s -> {seconds:.4f} s "
+                                   f"(+{(seconds / before - 1) * 100:.0f} %)")
+    return regressions
+
+
+def _remove_manifest(config):
+    # without the manifest, every repeat generates the QR code instead of skipping the up-to-date one
+    manifest_file_name = os.path.join(get_report_dir_name(config), MANIFEST_FILE_NAME)
+    if os.path.exists(manifest_file_name):
+        os.remove(manifest_file_name)
+
+
+@contextmanager
+def _mocked_fakturoid(invoices: List[dict], expenses: List[dict]):
+    page_size = FakturoidProcessor.PAGE_SIZE
+    pages = {
+        suffix: [json.dumps(documents[i:i + page_size]).encode("utf-8")
+                 for i in range(0, len(documents), page_size)]
+        for suffix, documents in (("invoices.json", invoices), ("expenses.json", expenses))
+    }
+
+    def request(_method, url, params, **_):
+        response = mock.Mock(headers={})
+        response.status_code = 200
+        bodies = pages[url.rsplit("/", 1)[-1]]
+        body = bodies[params["page"] - 1] if params["page"] <= len(bodies) else b"[]"
+        response.iter_content.return_value = [body[i:i + 65536] for i in range(0, len(body), 65536)]
+        return response
+
+    # no limiter, so fetch measures requests and parsing, not waits for the account quota
+    with mock.patch("requests.Session.request", side_effect=request), \
+            mock.patch.object(FakturoidProcessor, "_get_token", return_value="token"), \
+            mock.patch("src.fakturoid_processor.get_rate_limiter", return_value=None):
+        yield
+
+
+def _print_table(results: Dict[str, Dict[str, float]]):
+    sizes = list(results.keys())
+    print(f"{'stage':<15}" + "".join(f"{size:>14}" for size in sizes))
+    for stage in STAGES:
+        print(f"{stage:<15}" + "".join(f"{results[size][stage] * 1000:>12.2f}ms" for size in sizes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times every pipeline stage on synthetic ledgers.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of invoices and expenses")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best one counts")
+    parser.add_argument("--save", help="JSON file to store the results as a baseline")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio")
+    parser.add_argument("--min-seconds", type=float, default=0.001, help="ignored absolute slowdown")
+    args = parser.parse_args()
+
+    results = {str(size): run(size, args.repeat) for size in args.sizes}
+    _print_table(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, f,
+                      indent=2)
+
+    if args.compare and not os.path.exists(args.compare):
+        print(f"No baseline {args.compare} to compare with, create it on this machine by make bench-baseline.")
+    elif args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
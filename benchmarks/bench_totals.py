@@ -0,0 +1,68 @@
+"""
+Totals micro-benchmark, compares the former six sum() passes and a columnar table built per call
+with the single-pass minor unit sums of compute_totals.
+
+Usage: python bench_totals.py [sizes...]
+"""
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import Callable, List, Tuple
+
+sys.path.append("..")
+sys.path.append("../src")
+
+from ledger_generator import generate_ledger  # noqa: E402
+from src.dtos import Invoice  # noqa: E402
+from src.fakturoid_format import transform_invoices  # noqa: E402
+from src.ledger import compute_totals  # noqa: E402
+
+
+def six_passes(invoices: List[Invoice], expenses: List[Invoice]):
+    return (sum(i.total for i in invoices), sum(i.subtotal for i in invoices), sum(i.tax for i in invoices),
+            sum(e.total for e in expenses), sum(e.subtotal for e in expenses), sum(e.tax for e in expenses))
+
+
+def columnar_table(invoices: List[Invoice], expenses: List[Invoice]):
+    sums = []
+    for documents in (invoices, expenses):
+        columns = (array("q"), array("q"), array("q"), array("l"))
+        for d in documents:
+            columns[0].append(round(d.total * 100))
+            columns[1].append(round(d.subtotal * 100))
+            columns[2].append(round(d.tax * 100))
+            columns[3].append(d.taxable_fulfillment_due.toordinal())
+        sums.extend(sum(column) for column in columns[:3])
+    return sums
+
+
+def measure(totals: Callable, invoices: List[Invoice], expenses: List[Invoice]) -> Tuple[float, int]:
+    """
+    :return: seconds and peak traced memory in bytes of one call
+    """
+    started = time.perf_counter()
+    totals(invoices, expenses)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        totals(invoices, expenses)
+        return seconds, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'records':>10} | {'method':<16} | {'seconds':>8} | {'peak KiB':>9}")
+    for size in sizes:
+        records, _ = generate_ledger(size, months=48)
+        invoices = transform_invoices(records)
+        for name, totals in (("six passes", six_passes), ("columnar table", columnar_table),
+                             ("compute_totals", compute_totals)):
+            seconds, peak = measure(totals, invoices, invoices)
+            print(f"{size:>10} | {name:<16} | {seconds:>8.3f} | {peak / 1024:>9,.0f}")
+
+
+if __name__ == "__main__":
+    main()
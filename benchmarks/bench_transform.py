@@ -0,0 +1,64 @@
+"""
+Transform micro-benchmark, compares the former per-field strptime/float transform with the field-spec transformer.
+
+Usage: python bench_transform.py [sizes...]
+"""
+import math
+import sys
+import time
+from dataclasses import astuple
+from datetime import datetime
+from typing import Callable, List
+
+sys.path.append("..")
+sys.path.append("../src")
+
+from ledger_generator import generate_ledger  # noqa: E402
+from src.dtos import Invoice  # noqa: E402
+from src.fakturoid_processor import FakturoidProcessor  # noqa: E402
+from src.transform import parse_date  # noqa: E402
+
+
+def legacy_transform_invoices(invoices: List[dict]) -> List[Invoice]:
+    return [
+        Invoice(
+            due_on=datetime.strptime(invoice["due_on"], "%Y-%m-%d"),
+            id=invoice["id"],
+            issued_on=datetime.strptime(invoice["issued_on"], "%Y-%m-%d"),
+            note=invoice["note"],
+            number=invoice["number"],
+            order_number=invoice["order_number"],
+            client_registration_number=invoice["client_registration_no"],
+            subtotal=math.ceil(float(invoice["subtotal"])),
+            tax=math.ceil(float(invoice["total"])) - math.ceil(float(invoice["subtotal"])),
+            taxable_fulfillment_due=datetime.strptime(invoice["taxable_fulfillment_due"], "%Y-%m-%d"),
+            total=math.ceil(float(invoice["total"])),
+            html_url=invoice["html_url"],
+            variable_symbol=invoice["variable_symbol"],
+            client_vat_number=invoice["client_vat_no"],
+            vat_price_mode=invoice["vat_price_mode"],
+        ) for invoice in invoices
+    ]
+
+
+def records_per_second(transform: Callable[[List[dict]], list], records: List[dict]) -> float:
+    started = time.perf_counter()
+    transform(records)
+    return len(records) / (time.perf_counter() - started)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'records':>10} | {'before rec/s':>14} | {'after rec/s':>14} | speedup")
+    for size in sizes:
+        records, _ = generate_ledger(size, months=48)
+        assert [astuple(i) for i in legacy_transform_invoices(records[:1000])] == \
+               [astuple(i) for i in FakturoidProcessor.transform_invoices(records[:1000])]
+        parse_date.cache_clear()
+        before = records_per_second(legacy_transform_invoices, records)
+        after = records_per_second(FakturoidProcessor.transform_invoices, records)
+        print(f"{size:>10} | {before:>14,.0f} | {after:>14,.0f} | {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Local stand-in of the Fakturoid API endpoints used by FakturoidProcessor, serving a synthetic ledger.
+Paging, latency, server errors, rate limits and token expiry are configurable, so client throughput
+and resilience can be measured without network access.
+
+Usage:
+    python fakturoid_server.py --documents 10000 --months 12 --latency 0.05 --error-rate 0.01 --rate-limit 400
+and set "base_url": "http://127.0.0.1:8040/api/v3" in the fakturoid section of the config.
+"""
+import argparse
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append("..")
+
+from ledger_generator import SLUG, generate_ledger  # noqa: E402
+
+
+@dataclass
+class ServerOptions:
+    """
+    Behaviour of the stand-in server.
+    """
+    page_size: int = 40
+    # seconds added to every response, plus a uniform jitter of up to latency_jitter seconds
+    latency: float = 0
+    latency_jitter: float = 0
+    # probability of a 503 response of a document list
+    error_rate: float = 0
+    # requests per window and account, 0 for no limit
+    rate_limit: int = 0
+    rate_window: float = 60
+    # seconds until an issued token expires
+    token_ttl: int = 7200
+    seed: int = 42
+
+
+class FakturoidServer(ThreadingHTTPServer):
+    """
+    HTTP server with the ledger, the options and counters of served requests.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], invoices: List[dict], expenses: List[dict],
+                 options: ServerOptions = ServerOptions()):
+        super().__init__(address, _Handler)
+        self.documents = {"invoices.json": invoices, "expenses.json": expenses}
+        self.options = options
+        self.counters: Dict[int, int] = {}
+        self._tokens: Dict[str, float] = {}
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._random = random.Random(options.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v3"
+
+    def issue_token(self) -> str:
+        token = secrets.token_hex(16)
+        with self._lock:
+            self._tokens[token] = time.monotonic() + self.options.token_ttl
+        return token
+
+    def is_token_valid(self, token: str) -> bool:
+        with self._lock:
+            expires_at = self._tokens.get(token)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def take_rate_limit(self, account: str) -> Tuple[bool, int, float]:
+        """
+        Counts a request of the account in the current fixed window.
+        :param account:
+        :return: whether the request is allowed, remaining requests and seconds until the window resets
+        """
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._windows.get(account, (now, 0))
+            if now - started >= self.options.rate_window:
+                started, count = now, 0
+            reset = self.options.rate_window - (now - started)
+            if count >= self.options.rate_limit:
+                return False, 0, reset
+            self._windows[account] = (started, count + 1)
+            return True, self.options.rate_limit - count - 1, reset
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.options.error_rate
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.options.latency + self._random.uniform(0, self.options.latency_jitter)
+
+    def count(self, status: int):
+        with self._lock:
+            self.counters[status] = self.counters.get(status, 0) + 1
+
+    def handle_error(self, request, client_address):
+        # clients drop kept-alive connections, e.g., when closing a partially read response
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakturoidServer
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        time.sleep(self.server.delay())
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path != "/api/v3/oauth/token":
+            return self._send(HTTPStatus.NOT_FOUND, {"error": "not_found"})
+        if not (self.headers.get("Authorization") or "").startswith("Basic "):
+            return self._send(HTTPStatus.UNAUTHORIZED, {"error": "invalid_client"})
+        self._send(HTTPStatus.OK, {"access_token": self.server.issue_token(), "token_type": "Bearer",
+                                   "expires_in": self.server.options.token_ttl})
+
+    def do_GET(self):
+        time.sleep(self.server.delay())
+        url = urlparse(self.path)
+        parts = url.path.split("/")
+        # /api/v3/accounts/{slug}/{invoices,expenses}.json
+        if len(parts) != 6 or parts[:4] != ["", "api", "v3", "accounts"] or parts[5] not in self.server.documents:
+            return self._send(HTTPStatus.NOT_FOUND, {"error": "not_found"})
+
+        authorization = self.headers.get("Authorization") or ""
+        if not self.server.is_token_valid(authorization.removeprefix("Bearer ")):
+            return self._send(HTTPStatus.UNAUTHORIZED, {"error": "invalid_token"})
+
+        headers = {}
+        options = self.server.options
+        if options.rate_limit > 0:
+            allowed, remaining, reset = self.server.take_rate_limit(parts[4])
+            headers = {
+                "X-RateLimit-Policy": f"default;q={options.rate_limit};w={options.rate_window:g}",
+                "X-RateLimit": f"default;r={remaining};t={max(1, round(reset))}",
+            }
+            if not allowed:
+                headers["Retry-After"] = str(max(1, round(reset)))
+                return self._send(HTTPStatus.TOO_MANY_REQUESTS, {"error": "rate_limited"}, headers)
+
+        if self.server.should_fail():
+            return self._send(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "unavailable"}, headers)
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self._send(HTTPStatus.OK, self._page(self.server.documents[parts[5]], params), headers)
+
+    def _page(self, documents: List[dict], params: Dict[str, str]) -> List[dict]:
+        page = int(params.get("page", 1))
+        page_size = self.server.options.page_size
+        since, until, updated_since = params.get("since"), params.get("until"), params.get("updated_since")
+        # ISO timestamps of the same format compare as strings
+        selected = [d for d in documents
+                    if (since is None or d["created_at"] >= since) and (until is None or d["created_at"] < until)
+                    and (updated_since is None or d["updated_at"] >= updated_since)]
+        return selected[(page - 1) * page_size:page * page_size]
+
+    def _send(self, status: int, body, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(status)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve(invoices: List[dict], expenses: List[dict], options: ServerOptions = ServerOptions(),
+          host: str = "127.0.0.1", port: int = 0) -> Iterator[FakturoidServer]:
+    """
+    Runs the server in a background thread.
+    :param invoices:
+    :param expenses:
+    :param options:
+    :param host:
+    :param port: 0 picks a free port, see base_url of the server
+    :return:
+    """
+    server = FakturoidServer((host, port), invoices, expenses, options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves a synthetic ledger through a local Fakturoid API stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8040)
+    parser.add_argument("--documents", type=int, default=1000, help="number of invoices and of expenses")
+    parser.add_argument("--year", type=int, default=2023, help="year of the last month")
+    parser.add_argument("--month", type=int, default=6, help="last month")
+    parser.add_argument("--months", type=int, default=1, help="number of months the documents are spread over")
+    parser.add_argument("--page-size", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0, help="max random seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0, help="probability of a 503 response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per window and account, 0 for no limit")
+    parser.add_argument("--rate-window", type=float, default=60, help="rate limit window in seconds")
+    parser.add_argument("--token-ttl", type=int, default=7200, help="token lifetime in seconds")
+    args = parser.parse_args()
+
+    invoices, expenses = generate_ledger(args.documents, (args.year, args.month), args.months)
+    options = ServerOptions(page_size=args.page_size, latency=args.latency, latency_jitter=args.latency_jitter,
+                            error_rate=args.error_rate, rate_limit=args.rate_limit, rate_window=args.rate_window,
+                            token_ttl=args.token_ttl)
+    server = FakturoidServer((args.host, args.port), invoices, expenses, options)
+    print(f"Serving {len(invoices)} invoices and {len(expenses)} expenses of account {SLUG} on {server.base_url}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
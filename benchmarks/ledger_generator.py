@@ -0,0 +1,162 @@
+"""
+Synthetic Fakturoid-shaped invoices and expenses for benchmarks.
+"""
+import random
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from src.dtos import Config
+
+SLUG = "user"
+VAT_RATE = 0.21
+
+
+def generate_ledger(count: int, period: Tuple[int, int] = (2023, 6), months: int = 1, clients: int = 200,
+                    suppliers: int = 200, seed: int = 42) -> Tuple[List[dict], List[dict]]:
+    """
+    Invoices and expenses with taxable fulfillment due in the given and preceding months.
+    :param count: number of invoices and of expenses
+    :param period: year and month of the last month
+    :param months: number of months the documents are spread over
+    :param clients: number of distinct clients
+    :param suppliers: number of distinct suppliers
+    :param seed:
+    :return: invoices and expenses
+    """
+    rnd = random.Random(seed)
+    year, month = period
+    first_month = year * 12 + month - 1 - (months - 1)
+    month_starts = [date(index // 12, index % 12 + 1, 1) for index in range(first_month, first_month + months)]
+    invoices = [_invoice(rnd, i, _taxable_date(rnd, month_starts), rnd.randrange(clients)) for i in range(count)]
+    expenses = [_expense(rnd, i, _taxable_date(rnd, month_starts), rnd.randrange(suppliers)) for i in range(count)]
+    return invoices, expenses
+
+
+def client_vat_number(client: int) -> str:
+    return f"CZ{10_000_000 + client}"
+
+
+def supplier_vat_number(supplier: int) -> str:
+    return f"CZ{20_000_000 + supplier}"
+
+
+def generate_config(output: str, period: Tuple[int, int] = (2023, 6), clients: int = 200,
+                    suppliers: int = 200) -> Config:
+    """
+    Config valid for the generated ledger.
+    :param output:
+    :param period:
+    :param clients:
+    :param suppliers:
+    :return:
+    """
+    year, month = period
+    return Config.from_dict({
+        "period": {"year": year, "month": month},
+        "fakturoid": {"slug": SLUG, "client_id": "client_id", "client_secret": "client_secret",
+                      "email": "user@example.org", "token_cache_dir": None},
+        "user": {
+            "first_name": "John", "last_name": "Doe", "title": "", "phone_number": "123456432",
+            "email": "user@example.org",
+            "address": {"city": "Prague", "street_name": "Main", "street_number": 1, "street_orientation_number": "",
+                        "zip_code": 11000, "country": "Česká republika"},
+        },
+        "account": {"vat_number": 2151515135, "ufo_code": 450, "prac_ufo": 2113, "id_data_box": "abcdefg",
+                    "fs_tax_account": "705-77628031/0710"},
+        "output": output,
+        "valid_client_vat_numbers": [{"name": f"Client {c}", "number": client_vat_number(c)} for c in range(clients)],
+        "valid_supplier_vat_numbers": [{"name": f"Supplier {s}", "number": supplier_vat_number(s)}
+                                       for s in range(suppliers)],
+    })
+
+
+def _taxable_date(rnd: random.Random, month_starts: List[date]) -> date:
+    return rnd.choice(month_starts) + timedelta(days=rnd.randrange(28))
+
+
+def _amounts(rnd: random.Random) -> Tuple[str, str]:
+    subtotal = round(rnd.lognormvariate(8, 1.5), 2)
+    return f"{subtotal}", f"{round(subtotal * (1 + VAT_RATE), 2)}"
+
+
+def _timestamps(taxable_on: date) -> Dict[str, Any]:
+    created_at = datetime(taxable_on.year, taxable_on.month, taxable_on.day, 15, 31, 34) + timedelta(days=1)
+    return {
+        "created_at": f"{created_at.isoformat()}.573+02:00",
+        "updated_at": f"{(created_at + timedelta(days=3)).isoformat()}.232+02:00",
+    }
+
+
+def _invoice(rnd: random.Random, index: int, taxable_on: date, client: int) -> dict:
+    subtotal, total = _amounts(rnd)
+    number = f"{taxable_on.year}-{index:07}"
+    return {
+        "id": 1_000_000 + index,
+        "custom_id": None,
+        "document_type": "invoice",
+        "number": number,
+        "variable_symbol": number.replace("-", ""),
+        "client_name": f"Client {client}",
+        "client_street": "Company street 706/3",
+        "client_city": "Prague",
+        "client_zip": "18600",
+        "client_country": "CZ",
+        "client_registration_no": f"{10_000_000 + client}",
+        "client_vat_no": client_vat_number(client),
+        "subject_id": 2_000_000 + client,
+        "status": "paid",
+        "order_number": "",
+        "issued_on": taxable_on.isoformat(),
+        "taxable_fulfillment_due": taxable_on.isoformat(),
+        "due": 14,
+        "due_on": (taxable_on + timedelta(days=14)).isoformat(),
+        "note": "",
+        "tags": [],
+        "currency": "CZK",
+        "exchange_rate": "1.0",
+        "vat_price_mode": "without_vat",
+        "subtotal": subtotal,
+        "total": total,
+        "native_subtotal": subtotal,
+        "native_total": total,
+        "html_url": f"https://app.fakturoid.cz/{SLUG}/invoices/{1_000_000 + index}",
+        "url": f"https://app.fakturoid.cz/api/v3/accounts/{SLUG}/invoices/{1_000_000 + index}.json",
+        **_timestamps(taxable_on),
+    }
+
+
+def _expense(rnd: random.Random, index: int, taxable_on: date, supplier: int) -> dict:
+    subtotal, total = _amounts(rnd)
+    return {
+        "id": 1_000_000 + index,
+        "custom_id": None,
+        "document_type": "invoice",
+        "number": f"N{index:07}",
+        "original_number": f"{rnd.randrange(10 ** 8, 10 ** 9)}",
+        "variable_symbol": f"{rnd.randrange(10 ** 8, 10 ** 9)}",
+        "supplier_name": f"Supplier {supplier}",
+        "supplier_street": "Supplier street 1",
+        "supplier_city": "Brno",
+        "supplier_zip": "60200",
+        "supplier_country": "CZ",
+        "supplier_registration_no": f"{20_000_000 + supplier}",
+        "supplier_vat_no": supplier_vat_number(supplier),
+        "subject_id": 3_000_000 + supplier,
+        "status": "paid",
+        "issued_on": taxable_on.isoformat(),
+        "received_on": taxable_on.isoformat(),
+        "taxable_fulfillment_due": taxable_on.isoformat(),
+        "due_on": (taxable_on + timedelta(days=14)).isoformat(),
+        "tax_deductible": True,
+        "tags": [],
+        "currency": "CZK",
+        "exchange_rate": "1.0",
+        "vat_price_mode": "without_vat",
+        "subtotal": subtotal,
+        "total": total,
+        "native_subtotal": subtotal,
+        "native_total": total,
+        "html_url": f"https://app.fakturoid.cz/{SLUG}/expenses/{1_000_000 + index}",
+        "url": f"https://app.fakturoid.cz/api/v3/accounts/{SLUG}/expenses/{1_000_000 + index}.json",
+        **_timestamps(taxable_on),
+    }
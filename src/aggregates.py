@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.dtos import Config, Period, Totals
+from src.ledger import from_minor_units, to_minor_units
+
+AGGREGATES_FILE_NAME = "aggregates.sqlite"
+_COLUMNS = ("invoices_total", "invoices_subtotal", "invoices_tax", "invoices_count",
+            "expenses_total", "expenses_subtotal", "expenses_tax", "expenses_count")
+
+# path -> aggregates, one instance per file keeps its prefix sums valid across threads of the process
+aggregates_cache: Dict[str, "MonthlyAggregates"] = {}
+_aggregates_lock = threading.Lock()
+
+
+class MonthlyAggregates:
+    """
+    Local SQLite table of invoice and expense totals per month in minor units, updated for every generated period.
+    Totals of any range of months are differences of two prefix sums, built once after every change,
+    so no documents are fetched nor summed again.
+    """
+
+    def __init__(self, path: str):
+        self._path = os.path.expanduser(path)
+        # reentrant, prefix sums are loaded through a connection while the lock is held
+        self._lock = threading.RLock()
+        # period indexes of stored months and prefix sums of their columns, the first prefix sum is zeros
+        self._indexes: Optional[List[int]] = None
+        self._prefix_sums: List[Tuple[int, ...]] = []
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS monthly_totals (
+                    period INTEGER PRIMARY KEY,
+                    {", ".join(f"{column} INTEGER NOT NULL" for column in _COLUMNS)},
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def from_config(config: Config) -> "MonthlyAggregates":
+        """
+        Aggregates of the config shared by all its reports within the process.
+        :param config:
+        :return:
+        """
+        path = os.path.expanduser(config.aggregates or os.path.join(config.output, AGGREGATES_FILE_NAME))
+        with _aggregates_lock:
+            aggregates = aggregates_cache.get(path, None)
+            if aggregates is None:
+                aggregates = MonthlyAggregates(path)
+                aggregates_cache[path] = aggregates
+            return aggregates
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            connection = sqlite3.connect(self._path)
+            try:
+                with connection:
+                    yield connection
+            finally:
+                connection.close()
+
+    def update(self, period: Period, totals: Totals, invoices_count: int, expenses_count: int):
+        """
+        Replaces totals of the period.
+        :param period:
+        :param totals:
+        :param invoices_count:
+        :param expenses_count:
+        :return:
+        """
+        values = (to_minor_units(totals.total), to_minor_units(totals.subtotal), to_minor_units(totals.tax),
+                  invoices_count, to_minor_units(totals.supplier_total), to_minor_units(totals.supplier_subtotal),
+                  to_minor_units(totals.supplier_tax), expenses_count)
+        with self._connect() as connection:
+            connection.execute(f"INSERT OR REPLACE INTO monthly_totals (period, {', '.join(_COLUMNS)}, updated_at) "
+                               f"VALUES ({', '.join('?' * (len(_COLUMNS) + 2))})",
+                               (period.index(), *values, time.time()))
+            self._indexes = None
+
+    def periods(self) -> List[Period]:
+        """
+        Months with stored totals in ascending order.
+        :return:
+        """
+        indexes, _ = self._load()
+        return [Period(index // 12, index % 12 + 1) for index in indexes]
+
+    def totals_between(self, start: Period, end: Period) -> Tuple[Totals, int, int]:
+        """
+        Totals of the months from start to end, both inclusive, months without stored totals count as zero.
+        :param start:
+        :param end:
+        :return: totals, number of invoices and number of expenses
+        """
+        indexes, prefix_sums = self._load()
+        first = bisect_left(indexes, start.index())
+        last = bisect_right(indexes, end.index())
+        (total, subtotal, tax, invoices_count, supplier_total, supplier_subtotal, supplier_tax,
+         expenses_count) = (b - a for a, b in zip(prefix_sums[first], prefix_sums[max(first, last)]))
+        return Totals(
+            total=from_minor_units(total),
+            subtotal=from_minor_units(subtotal),
+            tax=from_minor_units(tax),
+            supplier_total=from_minor_units(supplier_total),
+            supplier_subtotal=from_minor_units(supplier_subtotal),
+            supplier_tax=from_minor_units(supplier_tax),
+            total_diff=from_minor_units(total - supplier_total),
+            tax_diff=from_minor_units(tax - supplier_tax)
+        ), invoices_count, expenses_count
+
+    def _load(self) -> Tuple[List[int], List[Tuple[int, ...]]]:
+        with self._lock:
+            if self._indexes is None:
+                with self._connect() as connection:
+                    rows = connection.execute(f"SELECT period, {', '.join(_COLUMNS)} FROM monthly_totals "
+                                              f"ORDER BY period").fetchall()
+                prefix_sums = [(0,) * len(_COLUMNS)]
+                for row in rows:
+                    prefix_sums.append(tuple(a + b for a, b in zip(prefix_sums[-1], row[1:])))
+                self._indexes = [row[0] for row in rows]
+                self._prefix_sums = prefix_sums
+            return self._indexes, self._prefix_sums
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prints totals of a range of months from the monthly aggregates.")
+    parser.add_argument("start", type=Period.parse, help="first period, YYYY-MM")
+    parser.add_argument("end", type=Period.parse, help="last period, YYYY-MM")
+    parser.add_argument("--config", default="../config.json", help="config file, its period is ignored")
+    args = parser.parse_args()
+
+    with open(args.config, encoding="utf-8") as config_file:
+        config: Config = Config.from_dict(json.load(config_file))
+
+    aggregates = MonthlyAggregates.from_config(config)
+    totals, invoices_count, expenses_count = aggregates.totals_between(args.start, args.end)
+    stored = aggregates.periods()
+    missing = [f"{p.year}-{p.month:02}" for p in Period.between(args.start, args.end) if p not in stored]
+
+    print(f"Invoices ({invoices_count}) total: {totals.total} ({totals.subtotal} base + {totals.tax} tax).")
+    print(f"Expenses ({expenses_count}) total: {totals.supplier_total} ({totals.supplier_subtotal} base "
+          f"+ {totals.supplier_tax} tax).")
+    print(f"Diff: {totals.total_diff}.")
+    print(f"Tax diff: {totals.tax_diff}.")
+    if missing:
+        print(f"Months never generated, counted as zero: {', '.join(missing)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator
+
+
+def write_atomically(file_name: str, chunks: Iterable[str]):
+    """
+    Writes chunks into a temporary file next to the target and renames it to the target,
+    so readers never see a partially written file.
+    :param file_name:
+    :param chunks:
+    :return:
+    """
+    with open_atomically(file_name) as f:
+        f.writelines(chunks)
+
+
+@contextmanager
+def open_atomically(file_name: str, mode: str = "w") -> Iterator[IO]:
+    """
+    Opens a temporary file next to the target, which replaces the target once the block succeeds
+    and is removed otherwise.
+    :param file_name:
+    :param mode: "w" for text in UTF-8 or "wb" for bytes
+    :return:
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(file_name) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, file_name)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
@@ -0,0 +1,33 @@
+import argparse
+import json
+
+from src.dtos import Config, Period
+from src.generator import generate_reports
+from src.logger import get_logger
+from src.processors import create_processor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates reports and QR payment codes of a range of periods.")
+    parser.add_argument("start", type=Period.parse, help="first period, YYYY-MM")
+    parser.add_argument("end", type=Period.parse, help="last period, YYYY-MM")
+    parser.add_argument("--config", default="../config.json", help="config file, its period is ignored")
+    args = parser.parse_args()
+    logger = get_logger("fs-reports")
+
+    with open(args.config, encoding="utf-8") as config_file:
+        config: Config = Config.from_dict(json.load(config_file))
+
+    processor = create_processor(config)
+
+    all_totals = generate_reports(processor, config, args.start, args.end, logger)
+
+    for (year, month), totals in all_totals.items():
+        if totals is None:
+            logger.info("%s-%02d: no invoices nor expenses.", year, month)
+        else:
+            logger.info("%s-%02d: tax diff %s.", year, month, totals.tax_diff)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+from src.dtos import Period
+
+
+class DocumentStore:
+    """
+    Local SQLite store of raw source documents, keyed by account, kind and id, indexed by taxable fulfillment due.
+    Keeps a high-water mark of the last seen updated_at per account and kind, so only changed documents need
+    to be synced. Accounts are separated, so configs of several accounts may share one store file.
+    """
+
+    # stores of earlier versions keyed documents without the account, they are dropped and synced again
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: str):
+        self._path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            if connection.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+                connection.executescript("""
+                    DROP TABLE IF EXISTS documents;
+                    DROP TABLE IF EXISTS sync_state;
+                """)
+            connection.executescript(f"""
+                CREATE TABLE IF NOT EXISTS documents (
+                    account TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    taxable_fulfillment_due TEXT,
+                    body TEXT NOT NULL,
+                    PRIMARY KEY (account, kind, id)
+                );
+                CREATE INDEX IF NOT EXISTS documents_taxable_fulfillment_due
+                    ON documents (account, kind, taxable_fulfillment_due);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    account TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    high_water_mark TEXT NOT NULL,
+                    PRIMARY KEY (account, kind)
+                );
+                PRAGMA user_version = {self.SCHEMA_VERSION};
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            connection = sqlite3.connect(self._path)
+            try:
+                with connection:
+                    yield connection
+            finally:
+                connection.close()
+
+    def get_high_water_mark(self, account: str, kind: str) -> Optional[str]:
+        """
+        The latest updated_at of the stored documents of the account and kind, None when nothing has been synced yet.
+        :param account: e.g., the account URL
+        :param kind:
+        :return:
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT high_water_mark FROM sync_state WHERE account = ? AND kind = ?",
+                                     (account, kind)).fetchone()
+        return row[0] if row is not None else None
+
+    def upsert(self, account: str, kind: str, documents: Iterable[dict]) -> int:
+        """
+        Inserts new and replaces changed documents, older versions than the stored ones are ignored.
+        Moves the high-water mark of the account and kind to the latest updated_at.
+        :param account: e.g., the account URL
+        :param kind:
+        :param documents:
+        :return: number of received documents
+        """
+        rows = [(account, kind, str(d["id"]), d["updated_at"], d.get("taxable_fulfillment_due"), json.dumps(d))
+                for d in documents]
+        if not rows:
+            return 0
+
+        with self._connect() as connection:
+            connection.executemany("""
+                INSERT INTO documents (account, kind, id, updated_at, taxable_fulfillment_due, body)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (account, kind, id) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    taxable_fulfillment_due = excluded.taxable_fulfillment_due,
+                    body = excluded.body
+                WHERE excluded.updated_at >= documents.updated_at
+            """, rows)
+            connection.execute("""
+                INSERT INTO sync_state (account, kind, high_water_mark)
+                SELECT ?, ?, MAX(updated_at) FROM documents WHERE account = ? AND kind = ?
+                ON CONFLICT (account, kind) DO UPDATE SET high_water_mark = excluded.high_water_mark
+            """, (account, kind, account, kind))
+        return len(rows)
+
+    def find(self, account: str, kind: str, start: Period, end: Period) -> List[dict]:
+        """
+        Documents of the account and kind with taxable fulfillment due from the start to the end period,
+        read via the index.
+        :param account: e.g., the account URL
+        :param kind:
+        :param start:
+        :param end:
+        :return:
+        """
+        since = f"{start.year}-{start.month:02}-01"
+        until = f"{end.next().year}-{end.next().month:02}-01"
+        with self._connect() as connection:
+            rows = connection.execute("""
+                SELECT body FROM documents
+                WHERE account = ? AND kind = ? AND taxable_fulfillment_due >= ? AND taxable_fulfillment_due < ?
+                ORDER BY taxable_fulfillment_due, CAST(id AS INTEGER), id
+            """, (account, kind, since, until)).fetchall()
+        return [json.loads(row[0]) for row in rows]
@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, List
+from typing import Any, List, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Invoice:
     """
     Invoice.
@@ -25,7 +25,7 @@ class Invoice:
     vat_price_mode: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Expense:
     """
     Expense.
@@ -62,6 +62,19 @@ class Totals:
     tax_diff: float
 
 
+@dataclass
+class ControlReport:
+    """
+    Control report (KH1) rows, documents under the threshold are reported as sums only.
+    """
+    invoices: List[Invoice]
+    expenses: List[Expense]
+    small_invoices_subtotal: float
+    small_invoices_tax: float
+    small_expenses_subtotal: float
+    small_expenses_tax: float
+
+
 @dataclass
 class Account:
     """
@@ -115,6 +128,12 @@ class Fakturoid:
     client_id: str
     client_secret: str
     email: str
+    pool_size: int = 10
+    # None keeps the token in memory only
+    token_cache_dir: Optional[str] = "~/.cache/fs-reports"
+    store: Optional[str] = None
+    base_url: str = "https://app.fakturoid.cz/api/v3"
+    until_margin_days: Optional[int] = None
 
     @staticmethod
     def from_dict(obj: Any) -> "Fakturoid":
@@ -122,7 +141,28 @@ class Fakturoid:
         client_id = str(obj.get("client_id"))
         client_secret = str(obj.get("client_secret"))
         email = str(obj.get("email"))
-        return Fakturoid(slug, client_id, client_secret, email)
+        pool_size = int(obj.get("pool_size", 10))
+        token_cache_dir = obj.get("token_cache_dir", "~/.cache/fs-reports")
+        store = obj.get("store")
+        base_url = str(obj.get("base_url", "https://app.fakturoid.cz/api/v3"))
+        until_margin_days = int(obj["until_margin_days"]) if obj.get("until_margin_days") is not None else None
+        return Fakturoid(slug, client_id, client_secret, email, pool_size, token_cache_dir, store, base_url,
+                         until_margin_days)
+
+
+@dataclass
+class File:
+    """
+    Files of invoices and expenses exported from Fakturoid.
+    """
+    invoices: str
+    expenses: str
+
+    @staticmethod
+    def from_dict(obj: Any) -> "File":
+        invoices = str(obj.get("invoices"))
+        expenses = str(obj.get("expenses"))
+        return File(invoices, expenses)
 
 
 @dataclass
@@ -139,6 +179,32 @@ class Period:
         month = int(obj.get("month"))
         return Period(year, month)
 
+    @staticmethod
+    def parse(value: str) -> "Period":
+        """
+        Period from YYYY-MM string.
+        :param value:
+        :return:
+        """
+        year, month = value.split("-")
+        return Period(int(year), int(month))
+
+    @staticmethod
+    def between(start: "Period", end: "Period") -> List["Period"]:
+        """
+        All periods from start to end, both inclusive.
+        :param start:
+        :param end:
+        :return:
+        """
+        return [Period(index // 12, index % 12 + 1) for index in range(start.index(), end.index() + 1)]
+
+    def index(self) -> int:
+        return self.year * 12 + self.month - 1
+
+    def next(self) -> "Period":
+        return Period(self.year + self.month // 12, self.month % 12 + 1)
+
 
 @dataclass
 class User:
@@ -193,21 +259,40 @@ class Config:
     Config.
     """
     period: Period
-    fakturoid: Fakturoid
+    fakturoid: Optional[Fakturoid]
     user: User
     account: Account
     output: str
     valid_client_vat_numbers: List[ValidClientVatNumber]
     valid_supplier_vat_numbers: List[ValidSupplierVatNumber]
+    workers: int = 1
+    valid_client_vat_numbers_file: Optional[str] = None
+    valid_supplier_vat_numbers_file: Optional[str] = None
+    instrumentation: bool = False
+    processor: str = "fakturoid"
+    file: Optional[File] = None
+    processors: Optional[List[str]] = None
+    aggregates: Optional[str] = None
 
     @staticmethod
     def from_dict(obj: Any) -> "Config":
         period = Period.from_dict(obj.get("period"))
-        fakturoid = Fakturoid.from_dict(obj.get("fakturoid"))
+        fakturoid = Fakturoid.from_dict(obj.get("fakturoid")) if obj.get("fakturoid") is not None else None
         user = User.from_dict(obj.get("user"))
         account = Account.from_dict(obj.get("account"))
         output = str(obj.get("output"))
-        valid_client_vat_numbers = [ValidClientVatNumber.from_dict(y) for y in obj.get("valid_client_vat_numbers")]
+        valid_client_vat_numbers = [ValidClientVatNumber.from_dict(y) for y in
+                                    obj.get("valid_client_vat_numbers") or []]
         valid_suppliers_vat_numbers = [ValidSupplierVatNumber.from_dict(y) for y in
-                                       obj.get("valid_supplier_vat_numbers")]
-        return Config(period, fakturoid, user, account, output, valid_client_vat_numbers, valid_suppliers_vat_numbers)
+                                       obj.get("valid_supplier_vat_numbers") or []]
+        workers = int(obj.get("workers", 1))
+        valid_client_vat_numbers_file = obj.get("valid_client_vat_numbers_file")
+        valid_supplier_vat_numbers_file = obj.get("valid_supplier_vat_numbers_file")
+        instrumentation = bool(obj.get("instrumentation", False))
+        processor = str(obj.get("processor", "fakturoid"))
+        file = File.from_dict(obj.get("file")) if obj.get("file") is not None else None
+        processors = [str(p) for p in obj.get("processors")] if obj.get("processors") else None
+        aggregates = obj.get("aggregates")
+        return Config(period, fakturoid, user, account, output, valid_client_vat_numbers, valid_suppliers_vat_numbers,
+                      workers, valid_client_vat_numbers_file, valid_supplier_vat_numbers_file, instrumentation,
+                      processor, file, processors, aggregates)
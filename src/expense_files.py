@@ -0,0 +1,127 @@
+import csv
+import glob
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from src.dtos import Config, Expense
+from src.fakturoid_format import transform_expenses_from_file
+from src.generator import get_report_dir_name
+from src.json_stream import iter_json_file
+
+EXPENSES_FILE_NAME = "expenses.json"
+EXPENSES_DIR_NAME = "expenses"
+
+# file name -> ((mtime, size), expenses of the file)
+file_cache: Dict[str, Tuple[Tuple[int, int], List[Expense]]] = {}
+_file_cache_lock = threading.Lock()
+
+
+class ExpenseFilesError(Exception):
+    """
+    Expense files which could not be read.
+    """
+
+    def __init__(self, errors: Dict[str, Exception]):
+        self.errors = errors
+        super().__init__("Error reading expense files: " +
+                         " ".join(f"{file_name}: {type(error).__name__}: {error}."
+                                  for file_name, error in sorted(errors.items())))
+
+
+def read_expenses_file(config: Config) -> List[Expense]:
+    """
+    Expenses missing in the data source: expenses.json and files of the expenses directory of the report directory.
+    Files are read concurrently by the config workers.
+    :param config:
+    :return: expenses in the order of file names, none when there are no files
+    :raises ExpenseFilesError: listing every file which could not be read
+    """
+    report_dir = get_report_dir_name(config)
+    file_names = find_expense_files(os.path.join(report_dir, EXPENSES_DIR_NAME))
+    legacy_file_name = os.path.join(report_dir, EXPENSES_FILE_NAME)
+    if os.path.isfile(legacy_file_name):
+        file_names.insert(0, legacy_file_name)
+    return load_expense_files(file_names, config.workers)
+
+
+def find_expense_files(directory: str) -> List[str]:
+    """
+    JSON, JSON Lines and CSV files of the directory sorted by name, none for a missing directory.
+    :param directory:
+    :return:
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(file_name for file_name in glob.glob(os.path.join(directory, "*"))
+                  if os.path.splitext(file_name)[1].lower() in _READERS)
+
+
+def load_expense_files(file_names: List[str], workers: int = 1) -> List[Expense]:
+    """
+    Expenses of all files, unchanged files are taken from the cache by their mtime and size.
+    :param file_names:
+    :param workers: number of files read concurrently
+    :return: expenses in the order of file names
+    :raises ExpenseFilesError: listing every file which could not be read, after all files are read
+    """
+    if workers > 1 and len(file_names) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(file_names))) as executor:
+            results = list(executor.map(_load_safely, file_names))
+    else:
+        results = [_load_safely(file_name) for file_name in file_names]
+
+    errors = {file_name: result for file_name, result in zip(file_names, results) if isinstance(result, Exception)}
+    if errors:
+        raise ExpenseFilesError(errors)
+    return [expense for expenses in results for expense in expenses]
+
+
+def load_expense_file(file_name: str) -> List[Expense]:
+    """
+    Expenses of a file, parsed as it is read and cached by its mtime and size.
+    :param file_name:
+    :return:
+    """
+    stat = os.stat(file_name)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _file_cache_lock:
+        cached = file_cache.get(file_name, None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    reader = _READERS[os.path.splitext(file_name)[1].lower()]
+    expenses = transform_expenses_from_file(reader(file_name))
+    with _file_cache_lock:
+        file_cache[file_name] = (key, expenses)
+    return expenses
+
+
+def _load_safely(file_name: str):
+    # unreadable, malformed or incomplete files are reported, e.g., short CSV rows or null amounts
+    # are TypeErrors of their None values, other programming errors are raised
+    try:
+        return load_expense_file(file_name)
+    except (OSError, ValueError, KeyError, TypeError, csv.Error) as ex:
+        return ex
+
+
+def _iter_json_lines(file_name: str) -> Iterator[dict]:
+    with open(file_name, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_csv(file_name: str) -> Iterator[dict]:
+    with open(file_name, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+_READERS: Dict[str, Callable[[str], Iterator[dict]]] = {
+    ".json": iter_json_file,
+    ".jsonl": _iter_json_lines,
+    ".csv": _iter_csv,
+}
@@ -0,0 +1,90 @@
+from typing import Iterable, List
+
+from src.dtos import Expense, Invoice, Period
+from src.transform import Transformer, constant, identity, parse_amount, parse_date
+
+
+def is_in_periods(document: dict, start: Period, end: Period) -> bool:
+    """
+    Whether taxable fulfillment due of a document in Fakturoid format is in the periods, both inclusive.
+    :param document:
+    :param start:
+    :param end:
+    :return:
+    """
+    taxable_fulfillment_due = document.get("taxable_fulfillment_due") or ""
+    return f"{start.year}-{start.month:02}" <= taxable_fulfillment_due[:7] <= f"{end.year}-{end.month:02}"
+
+
+def transform_invoices(invoices: Iterable[dict]) -> List[Invoice]:
+    return _INVOICE_TRANSFORMER(invoices)
+
+
+def transform_expenses(expenses: Iterable[dict]) -> List[Expense]:
+    return _EXPENSE_TRANSFORMER(expenses)
+
+
+def transform_expenses_from_file(expenses: Iterable[dict]) -> List[Expense]:
+    return _FILE_EXPENSE_TRANSFORMER(expenses)
+
+
+def _tax(values: dict) -> int:
+    return values["total"] - values["subtotal"]
+
+
+_EXPENSE_TRANSFORMER: Transformer[Expense] = Transformer(Expense, {
+    "document_type": ("document_type", identity),
+    "due_on": ("due_on", parse_date),
+    "id": ("id", identity),
+    "issued_on": ("issued_on", parse_date),
+    "original_number": ("original_number", identity),
+    "number": ("number", identity),
+    "supplier_registration_number": ("supplier_registration_no", identity),
+    "supplier_vat_number": ("supplier_vat_no", identity),
+    "subtotal": ("subtotal", parse_amount),
+    "taxable_fulfillment_due": ("taxable_fulfillment_due", parse_date),
+    "total": ("total", parse_amount),
+    "html_url": ("html_url", identity),
+    "variable_symbol": ("variable_symbol", identity),
+    "vat_price_mode": ("vat_price_mode", identity),
+}, {
+    "tax": _tax,
+})
+
+_FILE_EXPENSE_TRANSFORMER: Transformer[Expense] = Transformer(Expense, {
+    "document_type": (None, constant("")),
+    "due_on": ("due_on", parse_date),
+    "issued_on": ("issued_on", parse_date),
+    "original_number": ("original_number", identity),
+    "number": (None, constant("")),
+    "supplier_registration_number": ("supplier_registration_number", identity),
+    "supplier_vat_number": ("supplier_vat_number", identity),
+    "subtotal": ("subtotal", parse_amount),
+    "taxable_fulfillment_due": ("taxable_fulfillment_due", parse_date),
+    "total": ("total", parse_amount),
+    "html_url": (None, constant("")),
+    "variable_symbol": ("variable_symbol", identity),
+    "vat_price_mode": (None, constant("")),
+}, {
+    "id": lambda values: values["supplier_registration_number"] + "-" + values["variable_symbol"],
+    "tax": _tax,
+})
+
+_INVOICE_TRANSFORMER: Transformer[Invoice] = Transformer(Invoice, {
+    "due_on": ("due_on", parse_date),
+    "id": ("id", identity),
+    "issued_on": ("issued_on", parse_date),
+    "note": ("note", identity),
+    "number": ("number", identity),
+    "order_number": ("order_number", identity),
+    "client_registration_number": ("client_registration_no", identity),
+    "subtotal": ("subtotal", parse_amount),
+    "taxable_fulfillment_due": ("taxable_fulfillment_due", parse_date),
+    "total": ("total", parse_amount),
+    "html_url": ("html_url", identity),
+    "variable_symbol": ("variable_symbol", identity),
+    "client_vat_number": ("client_vat_no", identity),
+    "vat_price_mode": ("vat_price_mode", identity),
+}, {
+    "tax": _tax,
+})
@@ -1,19 +1,29 @@
-import json
-import math
+import logging
+import threading
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Optional
+from http import HTTPStatus
+from typing import Iterable, Iterator, List, Optional
 
 import requests
 from requests.auth import _basic_auth_str
 
-from dtos import Period, Invoice, Expense, Config
-from processor import Processor
-from src.generator import get_report_dir_name
+from src.document_store import DocumentStore
+from src.dtos import Config, Expense, Invoice, Period
+from src.expense_files import read_expenses_file
+from src.fakturoid_format import is_in_periods, transform_expenses, transform_expenses_from_file, transform_invoices
+from src.http_session import get_session, request_with_retries
+from src.instrumentation import Instrumentation
+from src.rate_limiter import get_rate_limiter
+from src.json_stream import CHUNK_SIZE, iter_json_array
+from src.processor import Processor
+from src.token_cache import TokenCache
 
 
 # from requests.auth import basic_auth_str
 
+BASE_URL = "https://app.fakturoid.cz/api/v3"
+
 
 @dataclass
 class FakturoidAuth:
@@ -28,141 +38,276 @@ class FakturoidProcessor(Processor):
     Fakturoid data processor.
     """
 
-    def __init__(self, auth: FakturoidAuth):
-        super().__init__()
+    PAGE_SIZE = 40
+    TOKEN_EXPIRY_MARGIN = timedelta(seconds=60)
+
+    def __init__(self, auth: FakturoidAuth, since_margin: timedelta = timedelta(days=31),
+                 until_margin: Optional[timedelta] = None, workers: int = 1,
+                 pool_size: int = 10, timeout: float = 2, retries: int = 3, backoff: float = 0.5,
+                 token_cache_dir: Optional[str] = None, store: Optional[DocumentStore] = None,
+                 instrumentation: Optional[Instrumentation] = None, base_url: str = BASE_URL,
+                 rate_limited: bool = True):
+        """
+        :param auth:
+        :param since_margin: how long before the period start a document of the period may have been created
+        :param until_margin: how long after the period end a document of the period may have been created,
+            None for no upper bound, so late entered documents, e.g., late supplier invoices, are never missed
+        :param workers: number of concurrent requests
+        :param pool_size: max number of kept-alive connections of the shared session
+        :param timeout: request timeout in seconds
+        :param retries: max number of retries of a timed out or 5xx request
+        :param backoff: base retry delay in seconds
+        :param token_cache_dir: directory of the on-disk token cache, None keeps the token in memory only
+        :param store: local store synced incrementally and queried instead of listing the period from the API
+        :param instrumentation: counts requests and received bytes and measures the token request
+        :param base_url: API root, e.g., of a local stand-in server
+        :param rate_limited: whether requests follow the rate limit headers of the account, False sends them at once
+        """
+        super().__init__(workers, instrumentation)
         self._auth = auth
-        self._base_url = "https://app.fakturoid.cz/api/v3"
+        self._base_url = base_url.rstrip("/")
         self._accounts_url = f"{self._base_url}/accounts"
+        # identifies the account in the shared rate limiter and store
+        self._account_url = f"{self._accounts_url}/{auth.slug}"
         self._token: Optional[str] = None
         self._expires_at: Optional[datetime] = None
+        self._token_lock = threading.Lock()
+        # tokens of the same client id of another API root are different tokens
+        self._token_cache = TokenCache(token_cache_dir, f"{self._base_url} {auth.client_id}") \
+            if token_cache_dir is not None else None
+        self._since_margin = since_margin
+        self._until_margin = until_margin
+        self._session = get_session(max(pool_size, self._workers))
+        # shared by all processors of the account, so concurrent fetchers and tenants do not exceed its limits
+        self._rate_limiter = get_rate_limiter(self._account_url) if rate_limited else None
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._store = store
+
+    @staticmethod
+    def from_config(config: Config) -> "FakturoidProcessor":
+        fakturoid = config.fakturoid
+        if fakturoid is None:
+            raise ValueError("The fakturoid processor needs the fakturoid section in the config.")
+        until_margin = timedelta(days=fakturoid.until_margin_days) if fakturoid.until_margin_days is not None else None
+        return FakturoidProcessor(
+            FakturoidAuth(
+                client_id=fakturoid.client_id,
+                client_secret=fakturoid.client_secret,
+                email=fakturoid.email,
+                slug=fakturoid.slug
+            ),
+            workers=config.workers,
+            pool_size=fakturoid.pool_size,
+            token_cache_dir=fakturoid.token_cache_dir,
+            until_margin=until_margin,
+            store=DocumentStore(fakturoid.store) if fakturoid.store is not None else None,
+            instrumentation=Instrumentation(enabled=config.instrumentation),
+            base_url=fakturoid.base_url
+        )
 
     def process_invoices(self, period: Period) -> List[Invoice]:
-        data = self._get_all_invoices_for(period, self._auth)
-        return FakturoidProcessor.transform_invoices(data)
+        return self.process_invoices_between(period, period)
 
     def process_expenses(self, period: Period) -> List[Expense]:
-        data = self._get_all_expenses_for(period, self._auth)
+        return self.process_expenses_between(period, period)
+
+    def process_invoices_between(self, start: Period, end: Period) -> List[Invoice]:
+        data = self._get_all_invoices_for(start, end, self._auth)
+        return FakturoidProcessor.transform_invoices(data)
+
+    def process_expenses_between(self, start: Period, end: Period) -> List[Expense]:
+        data = self._get_all_expenses_for(start, end, self._auth)
         return FakturoidProcessor.transform_expenses(data)
 
     def process_expenses_from_file(self, config: Config) -> List[Expense]:
-        try:
-            with open(f"{get_report_dir_name(config)}/expenses.json", "r") as f:
-                data: list[dict] = json.load(f)
-                return FakturoidProcessor.transform_expenses_from_file(data)
-        except Exception as ex:
-            print(f"Error reading expenses from file: {ex}")
-            return []
+        return read_expenses_file(config)
+
+    def warm_up(self):
+        self._get_token(self._auth)
 
     def _get_url(self, auth: FakturoidAuth, suffix: str):
         return f"{self._accounts_url}/{auth.slug}/{suffix}"
 
     def _get_token(self, auth: FakturoidAuth):
-        now = datetime.now()
-        if self._token is not None and self._expires_at is not None and self._expires_at > now:
+        with self._token_lock:
+            now = datetime.now()
+            if self._is_token_valid(now):
+                return self._token
+
+            if self._token_cache is None:
+                self._request_token(auth, now)
+                return self._token
+
+            with self._token_cache.locked() as cache:
+                cached = cache.load(now + self.TOKEN_EXPIRY_MARGIN)
+                if cached is not None:
+                    self._token, self._expires_at = cached
+                else:
+                    self._request_token(auth, now)
+                    cache.save(self._token, self._expires_at)
             return self._token
 
+    def _discard_token(self, token: str):
+        """
+        Forgets a token rejected before its expiration, e.g., revoked, in memory and on disk,
+        unless another thread or process has already replaced it.
+        :param token:
+        :return:
+        """
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+                self._expires_at = None
+            if self._token_cache is not None:
+                with self._token_cache.locked() as cache:
+                    cache.discard(token)
+
+    def _is_token_valid(self, now: datetime) -> bool:
+        return self._token is not None and self._expires_at is not None and \
+            self._expires_at > now + self.TOKEN_EXPIRY_MARGIN
+
+    def _request_token(self, auth: FakturoidAuth, now: datetime):
         url = f"{self._base_url}/oauth/token"
-        r = requests.post(
-            url,
-            headers={
-                "User-Agent": f"fsreport ({auth.email})",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": _basic_auth_str(auth.client_id, auth.client_secret)
-            },
-            json={"grant_type": "client_credentials"},
-            timeout=2
-        )
-        data = r.json()
+        with self.instrumentation.stage("oauth") as metrics:
+            r = self._request(
+                "POST",
+                url,
+                headers={
+                    "User-Agent": f"fsreport ({auth.email})",
+                    "Content-Type": "application/json",
+                    "Accept": "application/json",
+                    "Authorization": _basic_auth_str(auth.client_id, auth.client_secret)
+                },
+                json={"grant_type": "client_credentials"}
+            )
+            r.raise_for_status()
+            data = r.json()
+            metrics.records = 1
         self._token = data["access_token"]
         self._expires_at = now + timedelta(seconds=data["expires_in"])
-        return self._token
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        self.instrumentation.count_request()
+        return request_with_retries(self._session, method, url, retries=self._retries, backoff=self._backoff,
+                                    rate_limiter=self._rate_limiter, timeout=self._timeout, **kwargs)
 
     def _create_headers_with_token(self):
         return {
             "Authorization": f"Bearer {self._get_token(self._auth)}",
         }
 
-    def _get_all_invoices_for(self, period: Period, auth: FakturoidAuth) -> List[dict]:
-        r = requests.get(self._get_url(auth, "invoices.json"), headers=self._create_headers_with_token(), timeout=2)
-        invoices_all = r.json()
+    def _request_with_token(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Request authorized by the token, a rejected token is discarded and the request is retried once with a new one.
+        :param method:
+        :param url:
+        :param kwargs:
+        :return:
+        """
+        headers = self._create_headers_with_token()
+        r = self._request(method, url, headers=headers, **kwargs)
+        if r.status_code != HTTPStatus.UNAUTHORIZED:
+            return r
+        r.close()
+        self._discard_token(headers["Authorization"].removeprefix("Bearer "))
+        return self._request(method, url, headers=self._create_headers_with_token(), **kwargs)
+
+    def _get_all_invoices_for(self, start: Period, end: Period, auth: FakturoidAuth) -> Iterable[dict]:
+        if self._store is not None:
+            self._sync(auth, "invoices")
+            return self._store.find(self._account_url, "invoices", start, end)
+
+        invoices_all = self._iter_documents(auth, "invoices.json", start, end)
+        return filter(lambda i: self._is_in_periods(i, start, end), invoices_all)
 
-        invoices = list(filter(lambda i: self._is_in_period(i, period), invoices_all))
-        return invoices
+    def _get_all_expenses_for(self, start: Period, end: Period, auth: FakturoidAuth) -> Iterable[dict]:
+        if self._store is not None:
+            self._sync(auth, "expenses")
+            return self._store.find(self._account_url, "expenses", start, end)
 
-    def _get_all_expenses_for(self, period: Period, auth: FakturoidAuth) -> List[dict]:
-        r = requests.get(self._get_url(auth, "expenses.json"), headers=self._create_headers_with_token(), timeout=2)
-        expenses_all = r.json()
+        expenses_all = self._iter_documents(auth, "expenses.json", start, end)
+        return filter(lambda i: self._is_in_periods(i, start, end), expenses_all)
 
-        expenses = list(filter(lambda i: self._is_in_period(i, period), expenses_all))
-        return expenses
+    def _sync(self, auth: FakturoidAuth, kind: str) -> int:
+        """
+        Fetches documents of the kind updated since the store high-water mark into the store.
+        Documents deleted in Fakturoid are not detected, delete the store file to resync from scratch.
+        :param auth:
+        :param kind:
+        :return: number of fetched documents
+        """
+        high_water_mark = self._store.get_high_water_mark(self._account_url, kind)
+        params = {"updated_since": high_water_mark} if high_water_mark is not None else {}
+        documents = self._iter_pages(lambda page: self._get_page(auth, f"{kind}.json", params, page), self.PAGE_SIZE)
+        return self._store.upsert(self._account_url, kind, documents)
 
-    def _is_in_period(self, invoice: dict, period: Period):
-        taxable_fulfillment_due = datetime.strptime(invoice["taxable_fulfillment_due"], "%Y-%m-%d")
-        return taxable_fulfillment_due.year == period.year and taxable_fulfillment_due.month == period.month
+    def _iter_documents(self, auth: FakturoidAuth, suffix: str, start: Period, end: Period) -> Iterator[dict]:
+        """
+        Iterates over all pages of a document list narrowed to the periods by server-side filters.
+        Documents are yielded as pages arrive, paging stops at the first short page.
+        :param auth:
+        :param suffix:
+        :param start:
+        :param end:
+        :return:
+        """
+        params = self._get_period_filter(start, end)
+        return self._iter_pages(lambda page: self._get_page(auth, suffix, params, page), self.PAGE_SIZE)
+
+    def _get_page(self, auth: FakturoidAuth, suffix: str, params: dict, page: int) -> Iterator[dict]:
+        """
+        Documents of the page, parsed incrementally from the response stream.
+        :param auth:
+        :param suffix:
+        :param params:
+        :param page:
+        :return:
+        """
+        r = self._request_with_token(
+            "GET",
+            self._get_url(auth, suffix),
+            params={**params, "page": page},
+            stream=True
+        )
+        try:
+            r.raise_for_status()
+            yield from iter_json_array(self.instrumentation.count_chunks(r.iter_content(CHUNK_SIZE)))
+        finally:
+            r.close()
+
+    def _get_period_filter(self, start: Period, end: Period) -> dict:
+        """
+        Server-side filter for documents of the periods.
+        Fakturoid filters lists by the creation time only, so the window is widened by the margins
+        and the exact match on taxable fulfillment due is done by _is_in_periods.
+        :param start:
+        :param end:
+        :return:
+        """
+        period_start = datetime(start.year, start.month, 1)
+        period_end = datetime(end.next().year, end.next().month, 1)
+        params = {"since": (period_start - self._since_margin).isoformat()}
+        if self._until_margin is not None:
+            params["until"] = (period_end + self._until_margin).isoformat()
+            logging.getLogger("fs-reports").warning(
+                "Documents created after %s are not fetched, those entered later are missing in the report.",
+                params["until"])
+        return params
+
+    @staticmethod
+    def _is_in_periods(document: dict, start: Period, end: Period) -> bool:
+        return is_in_periods(document, start, end)
 
     @staticmethod
-    def transform_expenses(expenses: List[dict]) -> List[Expense]:
-        return [
-            Expense(
-                document_type=expense["document_type"],
-                due_on=datetime.strptime(expense["due_on"], "%Y-%m-%d"),
-                id=expense["id"],
-                issued_on=datetime.strptime(expense["issued_on"], "%Y-%m-%d"),
-                original_number=expense["original_number"],
-                number=expense["number"],
-                supplier_registration_number=expense["supplier_registration_no"],
-                supplier_vat_number=expense["supplier_vat_no"],
-                subtotal=math.ceil(float(expense["subtotal"])),
-                tax=math.ceil(float(expense["total"])) - math.ceil(float(expense["subtotal"])),
-                taxable_fulfillment_due=datetime.strptime(expense["taxable_fulfillment_due"], "%Y-%m-%d"),
-                total=math.ceil(float(expense["total"])),
-                html_url=expense["html_url"],
-                variable_symbol=expense["variable_symbol"],
-                vat_price_mode=expense["vat_price_mode"],
-            ) for expense in expenses
-        ]
+    def transform_expenses(expenses: Iterable[dict]) -> List[Expense]:
+        return transform_expenses(expenses)
 
     @staticmethod
-    def transform_expenses_from_file(expenses: List[dict]) -> List[Expense]:
-        return [
-            Expense(
-                document_type="",
-                due_on=datetime.strptime(expense["due_on"], "%Y-%m-%d"),
-                id=expense["supplier_registration_number"] + "-" + expense["variable_symbol"],
-                issued_on=datetime.strptime(expense["issued_on"], "%Y-%m-%d"),
-                original_number=expense["original_number"],
-                number="",
-                supplier_registration_number=expense["supplier_registration_number"],
-                supplier_vat_number=expense["supplier_vat_number"],
-                subtotal=math.ceil(float(expense["subtotal"])),
-                tax=math.ceil(float(expense["total"])) - math.ceil(float(expense["subtotal"])),
-                taxable_fulfillment_due=datetime.strptime(expense["taxable_fulfillment_due"], "%Y-%m-%d"),
-                total=math.ceil(float(expense["total"])),
-                html_url="",
-                variable_symbol=expense["variable_symbol"],
-                vat_price_mode="",
-            ) for expense in expenses
-        ]
+    def transform_expenses_from_file(expenses: Iterable[dict]) -> List[Expense]:
+        return transform_expenses_from_file(expenses)
 
     @staticmethod
-    def transform_invoices(invoices: List[dict]) -> List[Invoice]:
-        return [
-            Invoice(
-                due_on=datetime.strptime(invoice["due_on"], "%Y-%m-%d"),
-                id=invoice["id"],
-                issued_on=datetime.strptime(invoice["issued_on"], "%Y-%m-%d"),
-                note=invoice["note"],
-                number=invoice["number"],
-                order_number=invoice["order_number"],
-                client_registration_number=invoice["client_registration_no"],
-                subtotal=math.ceil(float(invoice["subtotal"])),
-                tax=math.ceil(float(invoice["total"])) - math.ceil(float(invoice["subtotal"])),
-                taxable_fulfillment_due=datetime.strptime(invoice["taxable_fulfillment_due"], "%Y-%m-%d"),
-                total=math.ceil(float(invoice["total"])),
-                html_url=invoice["html_url"],
-                variable_symbol=invoice["variable_symbol"],
-                client_vat_number=invoice["client_vat_no"],
-                vat_price_mode=invoice["vat_price_mode"],
-            ) for invoice in invoices
-        ]
+    def transform_invoices(invoices: Iterable[dict]) -> List[Invoice]:
+        return transform_invoices(invoices)
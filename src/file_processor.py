@@ -0,0 +1,48 @@
+from typing import List, Optional
+
+from src.dtos import Config, Expense, Invoice, Period
+from src.expense_files import read_expenses_file
+from src.fakturoid_format import is_in_periods, transform_expenses, transform_invoices
+from src.instrumentation import Instrumentation
+from src.json_stream import iter_json_file
+from src.processor import Processor
+
+
+class FileProcessor(Processor):
+    """
+    Processor of invoices and expenses exported from Fakturoid into JSON array files, no network access needed.
+    """
+
+    def __init__(self, invoices_file: str, expenses_file: str, workers: int = 1,
+                 instrumentation: Optional[Instrumentation] = None):
+        """
+        :param invoices_file: JSON array of invoices in the Fakturoid API format
+        :param expenses_file: JSON array of expenses in the Fakturoid API format
+        :param workers:
+        :param instrumentation:
+        """
+        super().__init__(workers, instrumentation)
+        self._invoices_file = invoices_file
+        self._expenses_file = expenses_file
+
+    @staticmethod
+    def from_config(config: Config) -> "FileProcessor":
+        if config.file is None:
+            raise ValueError("The file processor needs the file section in the config.")
+        return FileProcessor(config.file.invoices, config.file.expenses, workers=config.workers,
+                             instrumentation=Instrumentation(enabled=config.instrumentation))
+
+    def process_invoices(self, period: Period) -> List[Invoice]:
+        return self.process_invoices_between(period, period)
+
+    def process_expenses(self, period: Period) -> List[Expense]:
+        return self.process_expenses_between(period, period)
+
+    def process_invoices_between(self, start: Period, end: Period) -> List[Invoice]:
+        return transform_invoices(d for d in iter_json_file(self._invoices_file) if is_in_periods(d, start, end))
+
+    def process_expenses_between(self, start: Period, end: Period) -> List[Expense]:
+        return transform_expenses(d for d in iter_json_file(self._expenses_file) if is_in_periods(d, start, end))
+
+    def process_expenses_from_file(self, config: Config) -> List[Expense]:
+        return read_expenses_file(config)
@@ -1,78 +1,209 @@
 import os
-from datetime import date
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import date, datetime
 from logging import Logger
-from typing import List, Dict
-
-from jinja2 import Environment, FileSystemLoader, select_autoescape, StrictUndefined
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+from src.aggregates import MonthlyAggregates
+from src.atomic_files import write_atomically
 from src.dtos import Period, Invoice, Expense, Totals, Config
+from src.instrumentation import Instrumentation
+from src.ledger import CONTROL_REPORT_THRESHOLD, compute_control_report
+from src.logger import DOCUMENTS
+from src.manifest import Manifest, hash_inputs
 from src.processor import Processor
+from src.vat_registry import VatRegistry, get_client_vat_registry, get_supplier_vat_registry
+
+REPORTS = ("dphdp3", "dphkh1")
+
+
+class UnknownVatNumbersError(Exception):
+    """
+    Invoices or expenses with VAT numbers missing in the valid VAT numbers.
+    """
+
+    def __init__(self, clients: Set[str], suppliers: Set[str]):
+        self.clients = clients
+        self.suppliers = suppliers
+        messages = []
+        if clients:
+            messages.append(f"Clients with VAT numbers {', '.join(sorted(map(str, clients)))} "
+                            f"not found in valid client VAT numbers.")
+        if suppliers:
+            messages.append(f"Suppliers with VAT numbers {', '.join(sorted(map(str, suppliers)))} "
+                            f"not found in valid supplier VAT numbers.")
+        super().__init__(" ".join(messages))
 
 
 def generate_report(
         processor: Processor,
         config: Config,
+        logger: Logger,
+        qr_code: bool = False
+) -> Totals | None:
+    """
+    Generates reports of the config period.
+    :param processor:
+    :param config:
+    :param logger:
+    :param qr_code: whether to save QR payment code of the tax difference along with the reports
+    :return: totals, None when there are no documents
+    """
+    with processor.instrumentation.stage("fetch") as metrics:
+        invoices, expenses = processor.fetch(config)
+        metrics.records = len(invoices) + len(expenses)
+    return _generate_report_for(processor, config, invoices, expenses, logger, qr_code)
+
+
+def generate_reports(
+        processor: Processor,
+        config: Config,
+        start: Period,
+        end: Period,
         logger: Logger
+) -> Dict[Tuple[int, int], Totals | None]:
+    """
+    Generates reports and QR payment codes of all periods from start to end, both inclusive.
+    Documents of all the periods are fetched at once and partitioned by month.
+    The run record of enabled instrumentation is saved into the output directory.
+    :param processor:
+    :param config:
+    :param start:
+    :param end:
+    :param logger:
+    :return: totals per year and month, None for periods without documents
+    """
+    started = time.perf_counter()
+    with processor.instrumentation.stage("fetch") as metrics:
+        invoices, expenses = processor.fetch_between(config, start, end)
+        metrics.records = len(invoices) + len(expenses)
+    invoices_by_period = Processor.partition_by_period(invoices)
+    expenses_by_period = Processor.partition_by_period(expenses)
+    logger.info("Fetched %s invoices and %s expenses in %.3f s.", len(invoices), len(expenses),
+                time.perf_counter() - started)
+
+    all_totals: Dict[Tuple[int, int], Totals | None] = {}
+    for period in Period.between(start, end):
+        period_started = time.perf_counter()
+        key = (period.year, period.month)
+        period_config = replace(config, period=period)
+        totals = _generate_report_for(processor, period_config, invoices_by_period.get(key, []),
+                                      expenses_by_period.get(key, []), logger, qr_code=True)
+        all_totals[key] = totals
+        logger.info("Period %s-%s done in %.3f s.", period.year, period.month, time.perf_counter() - period_started)
+
+    logger.info("All periods done in %.3f s.", time.perf_counter() - started)
+    processor.instrumentation.write(config.output, f"{start.year}_{start.month}m-{end.year}_{end.month}m")
+    processor.instrumentation.reset()
+    return all_totals
+
+
+def save_qr_code(config: Config, totals: Totals, instrumentation: Optional[Instrumentation] = None) -> str:
+    """
+    Saves QR payment code of the tax difference into the report directory, unless the code is up to date.
+    :param config:
+    :param totals:
+    :param instrumentation: measures the qr stage when given
+    :return: QR code file name
+    """
+    instrumentation = instrumentation if instrumentation is not None else Instrumentation(enabled=False)
+    return _save_qr_code(config, totals, Manifest(get_report_dir_name(config)), instrumentation)
+
+
+def get_qr_code_file_name(config: Config) -> str:
+    return f"{get_report_dir_name(config)}/qr_code_{config.period.year}_{config.period.month}.svg"
+
+
+def save_run_record(processor: Processor, config: Config) -> List[str]:
+    """
+    Saves stages measured by the processor instrumentation next to the reports of the config period
+    as run_{year}_{month}m.json and metrics_{year}_{month}m.prom, then starts a new record.
+    Nothing is saved when the instrumentation is disabled.
+    :param processor:
+    :param config:
+    :return: saved file names
+    """
+    file_names = processor.instrumentation.write(get_report_dir_name(config),
+                                                 f"{config.period.year}_{config.period.month}m")
+    processor.instrumentation.reset()
+    return file_names
+
+
+def _generate_report_for(
+        processor: Processor,
+        config: Config,
+        invoices: List[Invoice],
+        expenses: List[Expense],
+        logger: Logger,
+        qr_code: bool = False
 ) -> Totals | None:
-    jinja_env = Environment(
-        loader=FileSystemLoader("../templates"),
-        autoescape=select_autoescape(["xml"]),
-        undefined=StrictUndefined
-    )
     period = config.period
-    invoices = processor.process_invoices(period)
-
-    valid_client_vat_numbers: Dict[str, str] = {vat.number: vat.name for vat in config.valid_client_vat_numbers}
-    valid_supplier_vat_numbers: Dict[str, str] = {vat.number: vat.name for vat in config.valid_supplier_vat_numbers}
 
-    for invoice in invoices:
-        if invoice.client_vat_number not in valid_client_vat_numbers.keys():
-            raise Exception(
-                f"Client with VAT number {invoice.client_vat_number} not found in valid client VAT numbers.")
+    instrumentation = processor.instrumentation
+    records = len(invoices) + len(expenses)
 
-    expenses = processor.process_expenses(period) + processor.process_expenses_from_file(config)
+    with instrumentation.stage("vat_validation") as metrics:
+        client_vat_registry = get_client_vat_registry(config)
+        supplier_vat_registry = get_supplier_vat_registry(config)
+        validate_vat_numbers(invoices, expenses, client_vat_registry, supplier_vat_registry)
+        metrics.records = records
 
-    for expense in expenses:
-        if expense.supplier_vat_number not in valid_supplier_vat_numbers.keys():
-            raise Exception(
-                f"Supplier with VAT number {expense.supplier_vat_number} not found in valid supplier VAT numbers.")
+    with instrumentation.stage("totals") as metrics:
+        totals = processor.generate_totals(invoices, expenses)
+        metrics.records = records
 
-    totals = processor.generate_totals(invoices, expenses)
+    with instrumentation.stage("control_report") as metrics:
+        control_report = compute_control_report(invoices, expenses)
+        metrics.records = records
 
-    _print_info(logger, period, invoices, expenses, totals, valid_client_vat_numbers, valid_supplier_vat_numbers)
+    _print_info(logger, period, invoices, expenses, totals, client_vat_registry, supplier_vat_registry)
 
+    aggregates = MonthlyAggregates.from_config(config)
     if len(invoices) == 0 and len(expenses) == 0:
+        # months without documents are recorded too, so ranges over them are complete
+        aggregates.update(period, totals, 0, 0)
         logger.info("No invoices nor expenses found, quitting.")
         return
 
+    # jinja2 is imported on the first render, so commands without rendering start fast
+    from src.template_engine import get_template_env  # pylint: disable=import-outside-toplevel
+    jinja_env = get_template_env()
+
     signed_on = date.today().strftime("%d.%m.%Y")
     report_dir = get_report_dir_name(config)
-    logger.info(f"Reports saved into file://{report_dir}.")
-
-    _save_report(report_dir, f"dphdp3_{period.year}_{period.month}m.xml",
-                 jinja_env.get_template("dphdp3_template.xml").render(invoices=invoices,
-                                                                      expenses=expenses,
-                                                                      totals=totals,
-                                                                      period=period,
-                                                                      env=os.environ,
-                                                                      signed_on=signed_on,
-                                                                      user=config.user,
-                                                                      account=config.account),
-                 logger)
-
-    _save_report(report_dir, f"dphkh1_{period.year}_{period.month}m.xml",
-                 jinja_env.get_template("dphkh1_template.xml").render(invoices=invoices,
-                                                                      expenses=expenses,
-                                                                      totals=totals,
-                                                                      period=period,
-                                                                      env=os.environ,
-                                                                      signed_on=signed_on,
-                                                                      user=config.user,
-                                                                      account=config.account),
-                 logger)
-
-    logger.info(f"Control report: https://adisspr.mfcr.cz/pmd/epo/novy/DPH_KH1.")
-    logger.info(f"VAT: https://adisspr.mfcr.cz/pmd/epo/novy/DPH_DP3.")
+    logger.info("Reports saved into file://%s.", report_dir)
+
+    context = {
+        "invoices": invoices,
+        "expenses": expenses,
+        "totals": totals,
+        "control_report": control_report,
+        "period": period,
+        "env": os.environ,
+        "signed_on": signed_on,
+        "user": config.user,
+        "account": config.account,
+    }
+
+    # unchanged outputs are skipped, templates are hashed as they may change between runs
+    manifest = Manifest(report_dir)
+    inputs_hash = hash_inputs(invoices, expenses, config.user, config.account, period, signed_on,
+                              CONTROL_REPORT_THRESHOLD)
+    # outputs are independent files written atomically, rendering of one overlaps writes of the others
+    with ThreadPoolExecutor(max_workers=len(REPORTS) + 1) as executor:
+        futures = [executor.submit(_render_report, jinja_env, report, context, inputs_hash, manifest, instrumentation,
+                                   logger) for report in REPORTS]
+        if qr_code:
+            futures.append(executor.submit(_save_qr_code, config, totals, manifest, instrumentation))
+        for future in futures:
+            future.result()
+    # recorded only once all outputs are saved, a failed report leaves the previous totals of the month
+    aggregates.update(period, totals, len(invoices), len(expenses))
+
+    logger.info("Control report: https://adisspr.mfcr.cz/pmd/epo/novy/DPH_KH1.")
+    logger.info("VAT: https://adisspr.mfcr.cz/pmd/epo/novy/DPH_DP3.")
 
     return totals
 
@@ -81,32 +212,107 @@ def get_report_dir_name(config: Config) -> str:
     return f"{config.output}/{config.period.year}_{config.period.month:02}"
 
 
+def validate_vat_numbers(invoices: List[Invoice], expenses: List[Expense], client_vat_registry: VatRegistry,
+                         supplier_vat_registry: VatRegistry):
+    """
+    Checks VAT numbers of all invoices and expenses at once.
+    :param invoices:
+    :param expenses:
+    :param client_vat_registry:
+    :param supplier_vat_registry:
+    :raises UnknownVatNumbersError: listing every unknown client and supplier VAT number
+    """
+    unknown_clients = client_vat_registry.find_unknown(invoice.client_vat_number for invoice in invoices)
+    unknown_suppliers = supplier_vat_registry.find_unknown(expense.supplier_vat_number for expense in expenses)
+    if unknown_clients or unknown_suppliers:
+        raise UnknownVatNumbersError(unknown_clients, unknown_suppliers)
+
+
 def _print_info(logger: Logger, period: Period, invoices: List[Invoice], expenses: List[Expense], totals: Totals,
-                valid_vat_numbers: Dict[str, str], valid_supplier_vat_numbers: Dict[str, str]):
-    logger.info(f"Report for period {period.year}-{period.month}.")
-    logger.info(f"Invoices ({len(invoices)}):")
-    for invoice in invoices:
-        logger.info(
-            f"\tInvoice {invoice.id} from client {valid_vat_numbers[invoice.client_vat_number]}, {invoice.html_url} for {invoice.total} ({invoice.subtotal} base + {invoice.tax} tax).")
-
-    logger.info(f"Expenses ({len(expenses)}):")
-    for expense in expenses:
-        logger.info(
-            f"\tExpense {expense.id} from supplier {valid_supplier_vat_numbers[expense.supplier_vat_number]}, {expense.html_url} for {expense.total} ({expense.subtotal} base + {expense.tax} tax).")
-
-    logger.info(f"Invoices total: {totals.total} ({totals.subtotal} base + {totals.tax} tax).")
-    logger.info(
-        f"Expenses total: {totals.supplier_total} ({totals.supplier_subtotal} base + {totals.supplier_tax} tax).")
-    logger.info(f"Diff: {totals.total_diff}.")
-    logger.info(f"Tax diff: {totals.tax_diff}.")
-
-
-def _save_report(report_dir: str, report_filename: str, data: str, logger: Logger):
-    try:
-        os.makedirs(report_dir)
-    except FileExistsError:
-        pass
+                valid_vat_numbers: VatRegistry, valid_supplier_vat_numbers: VatRegistry):
+    logger.info("Report for period %s-%s.", period.year, period.month)
+    if logger.isEnabledFor(DOCUMENTS):
+        logger.info("Invoices (%d):", len(invoices))
+        for invoice in invoices:
+            logger.log(DOCUMENTS, "\tInvoice %s from client %s, %s for %s (%s base + %s tax).", invoice.id,
+                       valid_vat_numbers.get_name(invoice.client_vat_number), invoice.html_url, invoice.total,
+                       invoice.subtotal, invoice.tax)
+
+        logger.info("Expenses (%d):", len(expenses))
+        for expense in expenses:
+            logger.log(DOCUMENTS, "\tExpense %s from supplier %s, %s for %s (%s base + %s tax).", expense.id,
+                       valid_supplier_vat_numbers.get_name(expense.supplier_vat_number), expense.html_url,
+                       expense.total, expense.subtotal, expense.tax)
+    else:
+        logger.info("Invoices (%d) from %d clients.", len(invoices),
+                    len({invoice.client_vat_number for invoice in invoices}))
+        logger.info("Expenses (%d) from %d suppliers.", len(expenses),
+                    len({expense.supplier_vat_number for expense in expenses}))
+
+    logger.info("Invoices total: %s (%s base + %s tax).", totals.total, totals.subtotal, totals.tax)
+    logger.info("Expenses total: %s (%s base + %s tax).", totals.supplier_total, totals.supplier_subtotal,
+                totals.supplier_tax)
+    logger.info("Diff: %s.", totals.total_diff)
+    logger.info("Tax diff: %s.", totals.tax_diff)
+
+
+def _render_report(jinja_env, report: str, context: dict, inputs_hash: str, manifest: Manifest,
+                   instrumentation: Instrumentation, logger: Logger):
+    period = context["period"]
+    report_dir = manifest.report_dir
+    template_name = f"{report}_template.xml"
+    report_filename = f"{report}_{period.year}_{period.month}m.xml"
+    # templates are streamed into the files, so the render stages include the writes
+    with instrumentation.stage(f"render_{report}") as metrics:
+        from src.template_engine import get_template_hash  # pylint: disable=import-outside-toplevel
+        report_hash = hash_inputs(inputs_hash, get_template_hash(jinja_env, template_name))
+        if manifest.is_current(report_filename, report_hash):
+            logger.info("Report %s/%s is up to date.", report_dir, report_filename)
+            return
+        _save_report(report_dir, report_filename, jinja_env.get_template(template_name).generate(context), logger)
+        manifest.update(report_filename, report_hash)
+        metrics.records = len(context["invoices"]) + len(context["expenses"])
+
+
+def _save_qr_code(config: Config, totals: Totals, manifest: Manifest, instrumentation: Instrumentation) -> str:
+    code_file_name_svg = get_qr_code_file_name(config)
+    code_file_name = os.path.basename(code_file_name_svg)
+
+    with instrumentation.stage("qr") as metrics:
+        due_date = datetime.now()
+        message = f"DPH {config.period.year}/{config.period.month:02}"
+        # the code holds the due date only, so it is regenerated once a day at most
+        code_hash = hash_inputs(config.account.fs_tax_account, totals.tax_diff, config.account.vat_number, message,
+                                due_date.date())
+        if manifest.is_current(code_file_name, code_hash):
+            return code_file_name_svg
+
+        # qrplatba is imported on the first QR code
+        from src.qr_payment import generate_qr_code  # pylint: disable=import-outside-toplevel
+        os.makedirs(manifest.report_dir, exist_ok=True)
+        generate_qr_code(
+            account=config.account.fs_tax_account,
+            amount=totals.tax_diff,
+            vs=config.account.vat_number,
+            message=message,
+            due_date=due_date,
+            file_name=code_file_name_svg
+        )
+        manifest.update(code_file_name, code_hash)
+        metrics.records = 1
+    return code_file_name_svg
+
+
+def _save_report(report_dir: str, report_filename: str, chunks: Iterable[str], logger: Logger):
+    """
+    Streams rendered report chunks into a temporary file, which then atomically replaces the report.
+    :param report_dir:
+    :param report_filename:
+    :param chunks:
+    :param logger:
+    :return:
+    """
+    os.makedirs(report_dir, exist_ok=True)
     full_name = f"{report_dir}/{report_filename}"
-    with open(full_name, "w", encoding="utf-8") as f:
-        f.write(data)
-    logger.info(f"Report saved into file://{full_name}.")
+    write_atomically(full_name, chunks)
+    logger.info("Report saved into file://%s.", full_name)
@@ -0,0 +1,74 @@
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.rate_limiter import RateLimiter
+
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# max number of waits for a rate limit reset, independent of retries
+RATE_LIMITED_RETRIES = 10
+
+session_cache: Dict[int, requests.Session] = {}
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = 10) -> requests.Session:
+    """
+    Shared session per pool size, so all processors of the process reuse the same connections.
+    :param pool_size: max number of kept-alive connections per host
+    :return:
+    """
+    with _session_lock:
+        session = session_cache.get(pool_size, None)
+        if session is not None:
+            return session
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        session_cache[pool_size] = session
+
+        return session
+
+
+def request_with_retries(session: requests.Session, method: str, url: str, retries: int = 3, backoff: float = 0.5,
+                         rate_limiter: Optional[RateLimiter] = None, **kwargs) -> requests.Response:
+    """
+    Sends a request, timeouts, connection errors and 5xx responses are retried with a full jitter exponential backoff.
+    With a rate limiter, every attempt waits for it and 429 responses are retried once the limiter allows.
+    The last response is returned even if it is still a 5xx or 429 one.
+    :param session:
+    :param method:
+    :param url:
+    :param retries: max number of retries after the first attempt
+    :param backoff: base delay in seconds, the n-th retry waits up to backoff * 2 ** n
+    :param rate_limiter: limiter shared by all requests of the account
+    :param kwargs: passed to the session request
+    :return:
+    """
+    attempt = 0
+    rate_limited = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+            if rate_limiter is not None and rate_limiter.update(response.status_code, response.headers) \
+                    and rate_limited < RATE_LIMITED_RETRIES:
+                rate_limited += 1
+                response.close()
+                continue
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                return response
+            response.close()
+        except (requests.Timeout, requests.ConnectionError):
+            if attempt >= retries:
+                raise
+        time.sleep(random.uniform(0, backoff * 2 ** attempt))
+        attempt += 1
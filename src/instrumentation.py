@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+
+@dataclass
+class StageMetrics:
+    """
+    Metrics of one pipeline stage.
+    """
+    stage: str
+    seconds: float = 0
+    requests: int = 0
+    bytes_received: int = 0
+    records: int = 0
+    peak_memory_bytes: int = 0
+    extra: Dict[str, float] = field(default_factory=dict)
+
+
+class Collector:
+    """
+    Custom metrics collector, its metrics are added to the extra metrics of every stage.
+    The base collector collects nothing, subclasses override the methods they need.
+    """
+
+    def start_stage(self, stage: str):  # pylint: disable=unused-argument
+        """
+        Called when the stage starts.
+        :param stage:
+        :return:
+        """
+
+    def end_stage(self, stage: str) -> Dict[str, float]:  # pylint: disable=unused-argument
+        """
+        Called when the stage ends.
+        :param stage:
+        :return: metrics of the stage by name
+        """
+        return {}
+
+
+class Instrumentation:
+    """
+    Opt-in per-stage metrics: wall time, requests, received bytes, records and peak traced memory.
+    Disabled instrumentation measures nothing and writes nothing.
+    """
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = True):
+        self.enabled = enabled
+        self._trace_memory = enabled and trace_memory
+        self._collectors: List[Collector] = []
+        self._stages: List[StageMetrics] = []
+        self._requests = 0
+        self._bytes_received = 0
+        self._lock = threading.Lock()
+        # peaks of open stages by their metrics id, stages may nest or run concurrently
+        self._peaks: Dict[int, int] = {}
+        # tracing started by the first open stage is stopped by the last one, tracing of others is left running
+        self._started_tracing = False
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def count_request(self):
+        if self.enabled:
+            with self._lock:
+                self._requests += 1
+
+    def count_bytes(self, count: int):
+        if self.enabled:
+            with self._lock:
+                self._bytes_received += count
+
+    def count_chunks(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Passes chunks of a response body through, counting their bytes.
+        :param chunks:
+        :return:
+        """
+        if not self.enabled:
+            yield from chunks
+            return
+        for chunk in chunks:
+            self.count_bytes(len(chunk))
+            yield chunk
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """
+        Measures the stage, set records of the yielded metrics to the number of processed records.
+        Requests and bytes are counted over the whole process, so concurrent stages see each other's requests.
+        :param name:
+        :return:
+        """
+        metrics = StageMetrics(name)
+        if not self.enabled:
+            yield metrics
+            return
+
+        for collector in self._collectors:
+            collector.start_stage(name)
+        with self._lock:
+            requests, bytes_received = self._requests, self._bytes_received
+        self._start_memory_peak(id(metrics))
+        started = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.seconds = time.perf_counter() - started
+            metrics.peak_memory_bytes = self._end_memory_peak(id(metrics))
+            with self._lock:
+                metrics.requests = self._requests - requests
+                metrics.bytes_received = self._bytes_received - bytes_received
+            for collector in self._collectors:
+                metrics.extra.update(collector.end_stage(name))
+            with self._lock:
+                self._stages.append(metrics)
+
+    @property
+    def stages(self) -> List[StageMetrics]:
+        return list(self._stages)
+
+    def reset(self):
+        with self._lock:
+            self._stages = []
+
+    def write(self, report_dir: str, name: str) -> List[str]:
+        """
+        Writes measured stages as a JSON run record and in Prometheus text format into the report directory.
+        :param report_dir:
+        :param name: file name suffix, e.g., 2023_6m
+        :return: written file names
+        """
+        if not self.enabled:
+            return []
+
+        os.makedirs(report_dir, exist_ok=True)
+        stages = self.stages
+        json_file_name = f"{report_dir}/run_{name}.json"
+        with open(json_file_name, "w", encoding="utf-8") as f:
+            json.dump({"finished_at": time.time(), "stages": [asdict(s) for s in stages]}, f, indent=2)
+
+        prometheus_file_name = f"{report_dir}/metrics_{name}.prom"
+        with open(prometheus_file_name, "w", encoding="utf-8") as f:
+            f.write(format_prometheus(stages))
+
+        return [json_file_name, prometheus_file_name]
+
+    def _start_memory_peak(self, key: int):
+        if not self._trace_memory:
+            return
+        with self._lock:
+            if not self._peaks:
+                self._started_tracing = not tracemalloc.is_tracing()
+                if self._started_tracing:
+                    tracemalloc.start()
+            # the peak is reset for this stage, keep the peaks of the other open stages so far
+            self._update_peaks()
+            self._peaks[key] = 0
+            tracemalloc.reset_peak()
+
+    def _end_memory_peak(self, key: int) -> int:
+        if not self._trace_memory:
+            return 0
+        with self._lock:
+            self._update_peaks()
+            peak = self._peaks.pop(key)
+            if not self._peaks and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+            return peak
+
+    def _update_peaks(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for key, value in self._peaks.items():
+            self._peaks[key] = max(value, peak)
+
+
+_METRICS = [
+    ("seconds", "Wall time of the stage in seconds."),
+    ("requests", "Number of HTTP requests sent during the stage."),
+    ("bytes_received", "Number of response body bytes received during the stage."),
+    ("records", "Number of records processed by the stage."),
+    ("peak_memory_bytes", "Peak traced memory during the stage."),
+]
+
+
+def format_prometheus(stages: List[StageMetrics]) -> str:
+    """
+    Stage metrics in Prometheus text exposition format, repeated stages are summed up, except peaks taking the max.
+    :param stages:
+    :return:
+    """
+    lines = []
+    for name, description in _METRICS:
+        values = _aggregate(((s.stage, getattr(s, name)) for s in stages), max if name.startswith("peak_") else sum)
+        lines.extend(_format_metric(name, description, values))
+    for name in sorted({name for s in stages for name in s.extra}):
+        values = _aggregate(((s.stage, s.extra[name]) for s in stages if name in s.extra), sum)
+        lines.extend(_format_metric(name, "Custom collector metric.", values))
+    return "\n".join(lines) + "\n"
+
+
+def _aggregate(values: Iterable[Tuple[str, float]], function: Callable[[List[float]], float]) -> Dict[str, float]:
+    by_stage: Dict[str, List[float]] = {}
+    for stage, value in values:
+        by_stage.setdefault(stage, []).append(value)
+    return {stage: function(stage_values) for stage, stage_values in by_stage.items()}
+
+
+def _format_metric(name: str, description: str, values: Dict[str, float]) -> List[str]:
+    metric = f"fs_reports_stage_{name}"
+    return [f"# HELP {metric} {description}", f"# TYPE {metric} gauge"] + \
+        [f"{metric}{{stage=\"{stage}\"}} {value}" for stage, value in values.items()]
@@ -0,0 +1,82 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Union
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(chunks: Iterable[Union[bytes, str]]) -> Iterator[Any]:
+    """
+    Incrementally parses a top-level JSON array and yields its items one by one,
+    so only the current item and one chunk are held in memory.
+    :param chunks: JSON text split anywhere, bytes are decoded as UTF-8
+    :return:
+    """
+    chunks = _decode(chunks)
+    buffer = ""
+    position = 0
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, position, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip(separators: str):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in separators:
+                position += 1
+            if position < len(buffer) or not read_more():
+                return
+
+    skip(_WHITESPACE)
+    if buffer[position:position + 1] != "[":
+        raise ValueError("JSON array expected.")
+    position += 1
+
+    while True:
+        skip(_WHITESPACE + ",")
+        if position >= len(buffer):
+            raise ValueError("Unterminated JSON array.")
+        if buffer[position] == "]":
+            return
+        try:
+            item, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if read_more():
+                continue
+            raise
+        # a number or literal at the buffer end may continue in the next chunk
+        if end == len(buffer) and not eof and read_more():
+            continue
+        position = end
+        yield item
+
+
+def iter_json_file(file_name: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Items of a JSON array file, parsed incrementally.
+    :param file_name:
+    :param chunk_size:
+    :return:
+    """
+    with open(file_name, "r", encoding="utf-8") as f:
+        yield from iter_json_array(iter(lambda: f.read(chunk_size), ""))
+
+
+def _decode(chunks: Iterable[Union[bytes, str]]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
@@ -0,0 +1,113 @@
+from typing import Iterable, List, Tuple, TypeVar, Union
+
+from src.dtos import ControlReport, Expense, Invoice, Totals
+
+MINOR_UNITS = 100
+# documents with total up to the threshold are summed up in the control report, only larger ones are listed
+CONTROL_REPORT_THRESHOLD = 10_000
+
+D = TypeVar("D", Invoice, Expense)
+
+
+def compute_totals(invoices: Iterable[Invoice], expenses: Iterable[Expense]) -> Totals:
+    """
+    Totals of invoices and expenses, each list is walked once and no intermediate table is built.
+    Amounts are summed in integer minor units and converted back only after summing, so sums are exact.
+    :param invoices:
+    :param expenses:
+    :return:
+    """
+    total, subtotal, tax = _sums(invoices)
+    supplier_total, supplier_subtotal, supplier_tax = _sums(expenses)
+
+    return Totals(
+        total=from_minor_units(total),
+        subtotal=from_minor_units(subtotal),
+        tax=from_minor_units(tax),
+        supplier_total=from_minor_units(supplier_total),
+        supplier_subtotal=from_minor_units(supplier_subtotal),
+        supplier_tax=from_minor_units(supplier_tax),
+        total_diff=from_minor_units(total - supplier_total),
+        tax_diff=from_minor_units(tax - supplier_tax)
+    )
+
+
+def _sums(documents: Iterable[Union[Invoice, Expense]]) -> Tuple[int, int, int]:
+    """
+    Sums of total, subtotal and tax in minor units in a single pass.
+    Whole amounts, as of transformed documents, are summed as they are and scaled once at the end,
+    amounts with decimals are summed in minor units, so float rounding never accumulates.
+    :param documents:
+    :return:
+    """
+    # whole units and minor units of amounts with decimals, per total, subtotal and tax
+    total = subtotal = tax = 0
+    minor_total = minor_subtotal = minor_tax = 0
+    for document in documents:
+        amount = document.total
+        if isinstance(amount, int):
+            total += amount
+        else:
+            minor_total += to_minor_units(amount)
+        amount = document.subtotal
+        if isinstance(amount, int):
+            subtotal += amount
+        else:
+            minor_subtotal += to_minor_units(amount)
+        amount = document.tax
+        if isinstance(amount, int):
+            tax += amount
+        else:
+            minor_tax += to_minor_units(amount)
+    return (total * MINOR_UNITS + minor_total, subtotal * MINOR_UNITS + minor_subtotal,
+            tax * MINOR_UNITS + minor_tax)
+
+
+def compute_control_report(invoices: Iterable[Invoice], expenses: Iterable[Expense],
+                           threshold: float = CONTROL_REPORT_THRESHOLD) -> ControlReport:
+    """
+    Splits documents at the per-document threshold of the control report in a single pass:
+    documents with total exceeding the threshold are reported one by one (VetaA4, VetaB2),
+    the rest is summed up (VetaA5, VetaB3).
+    :param invoices:
+    :param expenses:
+    :param threshold: total including tax
+    :return:
+    """
+    large_invoices, small_invoices_subtotal, small_invoices_tax = _split(invoices, to_minor_units(threshold))
+    large_expenses, small_expenses_subtotal, small_expenses_tax = _split(expenses, to_minor_units(threshold))
+    return ControlReport(
+        invoices=large_invoices,
+        expenses=large_expenses,
+        small_invoices_subtotal=from_minor_units(small_invoices_subtotal),
+        small_invoices_tax=from_minor_units(small_invoices_tax),
+        small_expenses_subtotal=from_minor_units(small_expenses_subtotal),
+        small_expenses_tax=from_minor_units(small_expenses_tax)
+    )
+
+
+def _split(documents: Iterable[D], threshold: int) -> Tuple[List[D], int, int]:
+    large = []
+    subtotal = tax = 0
+    for document in documents:
+        if to_minor_units(document.total) > threshold:
+            large.append(document)
+        else:
+            subtotal += to_minor_units(document.subtotal)
+            tax += to_minor_units(document.tax)
+    return large, subtotal, tax
+
+
+def to_minor_units(amount: float) -> int:
+    return round(amount * MINOR_UNITS)
+
+
+def from_minor_units(amount: int) -> Union[int, float]:
+    """
+    Whole amounts are returned as int, so they are rendered without decimals.
+    :param amount:
+    :return:
+    """
+    units, rest = divmod(amount, MINOR_UNITS)
+    return units if rest == 0 else amount / MINOR_UNITS
+
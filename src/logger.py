@@ -1,14 +1,50 @@
 # setup simple console logger
+import atexit
 import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional, Union
+
+# level of per-document lines, the summary-only verbosity is INFO
+DOCUMENTS = 15
+SUMMARY = logging.INFO
+
+logging.addLevelName(DOCUMENTS, "DOCUMENTS")
 
 logger_cache = {}
+_listeners: List[QueueListener] = []
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler leaving formatting of records to the listener thread.
+    Arguments of the queued records must not be mutated after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
-def get_logger(name: str) -> logging.Logger:
+def get_logger(name: str, level: Optional[Union[int, str]] = None, queued: Optional[bool] = None) -> logging.Logger:
+    """
+    Logger writing into the console and {name}-log.txt, cached by name.
+    :param name:
+    :param level: DEBUG or DOCUMENTS log every document, SUMMARY (INFO) logs aggregate counts only,
+        defaults to FS_REPORTS_LOG_LEVEL or DEBUG
+    :param queued: whether records are formatted and written by a background thread, so logging never blocks
+        on the console or disk, defaults to FS_REPORTS_LOG_QUEUE
+    :return:
+    """
     log = logger_cache.get(name, None)
     if log is not None:
         return log
 
+    if level is None:
+        level = os.environ.get("FS_REPORTS_LOG_LEVEL", logging.DEBUG)
+    if queued is None:
+        queued = os.environ.get("FS_REPORTS_LOG_QUEUE", "").lower() in ("1", "true", "yes")
+
     handler = logging.StreamHandler()
     formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(module)s | %(message)s', '%Y-%m-%d %H:%M:%S')
     handler.setFormatter(formatter)
@@ -16,10 +52,35 @@ def get_logger(name: str) -> logging.Logger:
     file_handler.setFormatter(formatter)
 
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    logger.addHandler(file_handler)
+    logger.setLevel(_parse_level(level))
+    if queued:
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, handler, file_handler)
+        listener.start()
+        _listeners.append(listener)
+        logger.addHandler(_DeferredQueueHandler(records))
+    else:
+        logger.addHandler(handler)
+        logger.addHandler(file_handler)
 
     logger_cache[name] = logger
 
     return logger
+
+
+def _parse_level(level: Union[int, str]) -> int:
+    if isinstance(level, int):
+        return level
+    if level.upper() == "SUMMARY":
+        return SUMMARY
+    parsed = logging.getLevelName(level.upper())
+    if not isinstance(parsed, int):
+        raise ValueError(f"Unknown log level {level}.")
+    return parsed
+
+
+@atexit.register
+def _stop_listeners():
+    # flushes queued records before exit
+    while _listeners:
+        _listeners.pop().stop()
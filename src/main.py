@@ -1,52 +1,57 @@
+import argparse
 import json
 import os
+import shutil
 import subprocess
-from datetime import datetime
+import sys
 from logging import Logger
 
-from dtos import Config, Totals
-from fakturoid_processor import FakturoidProcessor, FakturoidAuth
-from logger import get_logger
-from src.generator import generate_report, get_report_dir_name
-from src.qr_payment import generate_qr_code
-
-_logger: Logger = get_logger("fs-reports")
+from src.dtos import Config, Totals
+from src.generator import generate_report, get_qr_code_file_name, save_run_record
+from src.logger import get_logger
+from src.processors import create_processor
 
 
 def main():
-    with open("../config.json", encoding="utf-8") as config_file:
+    parser = argparse.ArgumentParser(description="Generates reports and QR payment code of the config period.")
+    parser.add_argument("--config", default="../config.json", help="config file")
+    parser.add_argument("--open", action="store_true", help="open the QR payment code in the default viewer")
+    args = parser.parse_args()
+    logger = get_logger("fs-reports")
+
+    with open(args.config, encoding="utf-8") as config_file:
         config: Config = Config.from_dict(json.load(config_file))
 
-    processor = FakturoidProcessor(FakturoidAuth(
-        client_id=config.fakturoid.client_id,
-        client_secret=config.fakturoid.client_secret,
-        email=config.fakturoid.email,
-        slug=config.fakturoid.slug
-    ))
+    processor = create_processor(config)
 
-    totals: Totals = generate_report(processor, config, _logger)
-    report_dir = get_report_dir_name(config)
+    totals: Totals = generate_report(processor, config, logger, qr_code=True)
+    save_run_record(processor, config)
 
-    try:
-        os.makedirs(report_dir)
-    except FileExistsError:
-        pass
-    code_file_name = f"{report_dir}/qr_code_{config.period.year}_{config.period.month}"
-    code_file_name_svg = f"{code_file_name}.svg"
+    logger.info("Now upload the report via https://adisspr.mfcr.cz/dpr/adis/idpr_epo/epo2/uvod/vstup_expert.faces")
 
-    generate_qr_code(
-        account=config.account.fs_tax_account,
-        amount=totals.tax_diff,
-        vs=config.account.vat_number,
-        message=f"DPH {config.period.year}/{config.period.month:02}",
-        due_date=datetime.now(),
-        file_name=code_file_name_svg
-    )
+    if args.open and totals is not None:
+        open_file(get_qr_code_file_name(config), logger)
 
-    subprocess.call(f"open {code_file_name_svg}", shell=True)
 
+def open_file(file_name: str, logger: Logger):
+    """
+    Opens the file in the default viewer of the platform without a shell and without waiting for the viewer.
+    :param file_name:
+    :param logger:
+    :return:
+    """
+    if sys.platform == "win32":
+        os.startfile(file_name)
+        return
+    opener = shutil.which("open" if sys.platform == "darwin" else "xdg-open")
+    if opener is None:
+        logger.warning("No viewer found to open %s.", file_name)
+        return
+    # the viewer outlives this process, so it is neither waited for nor closed
+    # pylint: disable-next=consider-using-with
+    subprocess.Popen([opener, file_name], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
 
-_logger.info("Now upload the report via https://adisspr.mfcr.cz/dpr/adis/idpr_epo/epo2/uvod/vstup_expert.faces")
 
 if __name__ == "__main__":
     main()
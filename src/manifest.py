@@ -0,0 +1,77 @@
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+from datetime import date
+from typing import Any, Dict
+
+from src.atomic_files import open_atomically
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+class Manifest:
+    """
+    Hashes of inputs of the files of a report directory, stored in its manifest.json.
+    A file whose inputs hash matches the stored one is up to date and need not be regenerated.
+    Files generated concurrently share one manifest, so none of their hashes is lost.
+    """
+
+    def __init__(self, report_dir: str):
+        self.report_dir = report_dir
+        self._file_name = os.path.join(report_dir, MANIFEST_FILE_NAME)
+        self._hashes: Dict[str, str] = self._load()
+        self._lock = threading.Lock()
+
+    def is_current(self, file_name: str, inputs_hash: str) -> bool:
+        """
+        Whether the file exists and was generated from inputs of the hash.
+        :param file_name: file name within the report directory
+        :param inputs_hash:
+        :return:
+        """
+        return self._hashes.get(file_name) == inputs_hash and os.path.exists(os.path.join(self.report_dir, file_name))
+
+    def update(self, file_name: str, inputs_hash: str):
+        """
+        Records inputs hash of a generated file and saves the manifest.
+        :param file_name: file name within the report directory
+        :param inputs_hash:
+        :return:
+        """
+        with self._lock:
+            self._hashes[file_name] = inputs_hash
+            os.makedirs(self.report_dir, exist_ok=True)
+            with open_atomically(self._file_name) as f:
+                json.dump(self._hashes, f, indent=2, sort_keys=True)
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with open(self._file_name, encoding="utf-8") as f:
+                hashes = json.load(f)
+        except (OSError, ValueError):
+            # a missing or broken manifest regenerates everything
+            return {}
+        return hashes if isinstance(hashes, dict) else {}
+
+
+def hash_inputs(*inputs: Any) -> str:
+    """
+    SHA-256 of inputs normalized into canonical JSON, dataclasses are hashed by their fields and dates in ISO format.
+    :param inputs:
+    :return:
+    """
+    digest = hashlib.sha256()
+    encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_normalize)
+    for chunk in encoder.iterencode(inputs):
+        digest.update(chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _normalize(value: Any) -> Any:
+    if dataclasses.is_dataclass(value):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Cannot hash {type(value).__name__}.")
@@ -0,0 +1,70 @@
+import heapq
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+from src.dtos import Expense, Invoice
+
+D = TypeVar("D", Invoice, Expense)
+
+
+def expense_key(expense: Expense) -> Optional[Tuple[str, str]]:
+    """
+    Identity of an expense across sources, None when it has no original number.
+    A variable symbol alone is no identity, recurring bills of a supplier often share it.
+    :param expense:
+    :return:
+    """
+    original_number = _normalize(expense.original_number)
+    if not original_number:
+        return None
+    return _normalize(expense.supplier_registration_number), original_number
+
+
+def invoice_key(invoice: Invoice) -> Optional[Tuple[str, str]]:
+    """
+    Identity of an invoice across sources, None when it has no number.
+    :param invoice:
+    :return:
+    """
+    number = _normalize(invoice.number)
+    if not number:
+        return None
+    return _normalize(invoice.client_registration_number), number
+
+
+def deduplicate(sources: Iterable[List[D]], key: Callable[[D], Optional[Hashable]]) -> List[List[D]]:
+    """
+    Documents of the sources without those whose key was found in an earlier source.
+    Every document of a single source is kept, as are documents without a key.
+    :param sources: documents per source in the order of priority
+    :param key: expense_key or invoice_key
+    :return: documents per source in their order
+    """
+    seen = set()
+    unique = []
+    for documents in sources:
+        keys = [key(document) for document in documents]
+        unique.append([document for document, document_key in zip(documents, keys)
+                       if document_key is None or document_key not in seen])
+        seen.update(document_key for document_key in keys if document_key is not None)
+    return unique
+
+
+def merge_documents(sources: List[List[D]], key: Callable[[D], Optional[Hashable]]) -> List[D]:
+    """
+    Merges documents of the sources by taxable fulfillment due and drops duplicates across sources.
+    Sources are sorted, which is linear for already sorted ones, and merged in a single pass.
+    :param sources: documents per source in the order of priority, the first source wins on a duplicate
+    :param key: expense_key or invoice_key
+    :return:
+    """
+    sorted_sources = [sorted(documents, key=_taxable_fulfillment_due) for documents in deduplicate(sources, key)]
+    return list(heapq.merge(*sorted_sources, key=_taxable_fulfillment_due))
+
+
+def _taxable_fulfillment_due(document: D):
+    return document.taxable_fulfillment_due
+
+
+def _normalize(value) -> str:
+    # file sources may hold numbers where the API has strings
+    return "" if value is None else str(value).strip()
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from src.dtos import Config, Expense, Invoice, Period
+from src.expense_files import read_expenses_file
+from src.instrumentation import Instrumentation
+from src.merge import D, expense_key, invoice_key, merge_documents
+from src.processor import Processor
+
+
+class MergedProcessor(Processor):
+    """
+    Processor of several sources, e.g., Fakturoid and files, fetched concurrently.
+    Their documents are merged by taxable fulfillment due and documents found in more sources are kept once.
+    """
+
+    def __init__(self, processors: List[Processor], workers: int = 1,
+                 instrumentation: Optional[Instrumentation] = None):
+        """
+        :param processors: sources in the order of priority, all share the instrumentation of the merged processor
+        :param workers:
+        :param instrumentation:
+        """
+        super().__init__(workers, instrumentation)
+        self._processors = processors
+        for processor in processors:
+            processor.instrumentation = self.instrumentation
+
+    def process_invoices(self, period: Period) -> List[Invoice]:
+        return self.process_invoices_between(period, period)
+
+    def process_expenses(self, period: Period) -> List[Expense]:
+        return self.process_expenses_between(period, period)
+
+    def process_invoices_between(self, start: Period, end: Period) -> List[Invoice]:
+        return self._merge(lambda p: p.process_invoices_between(start, end), invoice_key)
+
+    def process_expenses_between(self, start: Period, end: Period) -> List[Expense]:
+        return self._merge(lambda p: p.process_expenses_between(start, end), expense_key)
+
+    def process_expenses_from_file(self, config: Config) -> List[Expense]:
+        return read_expenses_file(config)
+
+    def warm_up(self):
+        for processor in self._processors:
+            processor.warm_up()
+
+    def _merge(self, process: Callable[[Processor], List[D]], key) -> List[D]:
+        # every source gets its own thread, so the merge takes as long as the slowest source
+        with ThreadPoolExecutor(max_workers=max(1, len(self._processors))) as executor:
+            sources = list(executor.map(process, self._processors))
+        return merge_documents(sources, key)
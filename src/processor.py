@@ -1,7 +1,15 @@
-from typing import List
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
 
-from dtos import Invoice, Expense, Period, Totals
-from src.dtos import Config
+from src.dtos import Config, Expense, Invoice, Period, Totals
+from src.instrumentation import Instrumentation
+from src.ledger import compute_totals
+from src.merge import deduplicate, expense_key
+
+T = TypeVar("T")
+D = TypeVar("D", Invoice, Expense)
 
 
 class Processor:
@@ -9,8 +17,93 @@ class Processor:
     Base Processor.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, workers: int = 1, instrumentation: Optional[Instrumentation] = None):
+        """
+        :param workers: number of concurrent source calls, 1 fetches sequentially
+        :param instrumentation: per-stage metrics of reports generated by the processor, None measures nothing
+        """
+        self._workers = max(1, workers)
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation(enabled=False)
+
+    def fetch(self, config: Config) -> Tuple[List[Invoice], List[Expense]]:
+        """
+        Fetches invoices and expenses of the config period.
+        :param config:
+        :return: invoices and expenses, expenses from the source are followed by expenses from files
+        """
+        return self.fetch_between(config, config.period, config.period)
+
+    def fetch_between(self, config: Config, start: Period, end: Period) -> Tuple[List[Invoice], List[Expense]]:
+        """
+        Fetches invoices and expenses from the start to the end period, both inclusive.
+        Independent source calls run concurrently when more workers are configured,
+        results are always returned in the same order.
+        :param config:
+        :param start:
+        :param end:
+        :return: invoices and expenses, expenses from the source are followed by expenses from files of the periods,
+        expenses of files found in the source are dropped
+        """
+        configs = [replace(config, period=period) for period in Period.between(start, end)]
+        if self._workers == 1:
+            invoices = self.process_invoices_between(start, end)
+            expenses = self.process_expenses_between(start, end)
+            expenses_from_files = [self.process_expenses_from_file(c) for c in configs]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self._workers, len(configs) + 2)) as executor:
+                invoices_future = executor.submit(self.process_invoices_between, start, end)
+                expenses_future = executor.submit(self.process_expenses_between, start, end)
+                expenses_from_files_futures = [executor.submit(self.process_expenses_from_file, c) for c in configs]
+                invoices = invoices_future.result()
+                expenses = expenses_future.result()
+                expenses_from_files = [f.result() for f in expenses_from_files_futures]
+
+        expenses_from_files = [e for expenses_from_file in expenses_from_files for e in expenses_from_file]
+        return invoices, [e for source in deduplicate([expenses, expenses_from_files], expense_key) for e in source]
+
+    @staticmethod
+    def partition_by_period(documents: Iterable[D]) -> Dict[Tuple[int, int], List[D]]:
+        """
+        Groups invoices or expenses by year and month of taxable fulfillment due in a single pass.
+        :param documents:
+        :return:
+        """
+        partitions: Dict[Tuple[int, int], List[D]] = defaultdict(list)
+        for document in documents:
+            partitions[(document.taxable_fulfillment_due.year, document.taxable_fulfillment_due.month)].append(document)
+        return partitions
+
+    def _iter_pages(self, get_page: Callable[[int], Iterable[T]], page_size: int) -> Iterator[T]:
+        """
+        Iterates over items of a paged source, pages are numbered from 1 and the first short page is the last one.
+        Sequentially, items are yielded as the page is read. With more workers, a window of pages is read
+        concurrently and the items are yielded in page order.
+        :param get_page:
+        :param page_size:
+        :return:
+        """
+        page = 1
+        if self._workers == 1:
+            while True:
+                count = 0
+                for item in get_page(page):
+                    count += 1
+                    yield item
+                if count < page_size:
+                    return
+                page += 1
+
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            while True:
+                window = [executor.submit(lambda p: list(get_page(p)), p) for p in range(page, page + self._workers)]
+                for future in window:
+                    items = future.result()
+                    yield from items
+                    if len(items) < page_size:
+                        for pending in window:
+                            pending.cancel()
+                        return
+                page += self._workers
 
     def process_invoices(self, period: Period) -> List[Invoice]:
         """
@@ -26,6 +119,26 @@ class Processor:
         :return:
         """
 
+    def process_invoices_between(self, start: Period, end: Period) -> List[Invoice]:
+        """
+        Invoice processing of the periods from start to end, both inclusive.
+        Processes period by period, override when the source can fetch them at once.
+        :param start:
+        :param end:
+        :return:
+        """
+        return [invoice for period in Period.between(start, end) for invoice in self.process_invoices(period)]
+
+    def process_expenses_between(self, start: Period, end: Period) -> List[Expense]:
+        """
+        Expenses processing of the periods from start to end, both inclusive.
+        Processes period by period, override when the source can fetch them at once.
+        :param start:
+        :param end:
+        :return:
+        """
+        return [expense for period in Period.between(start, end) for expense in self.process_expenses(period)]
+
     def process_expenses_from_file(self, config: Config) -> List[Expense]:
         """
         Expenses processing
@@ -33,6 +146,12 @@ class Processor:
         :return:
         """
 
+    def warm_up(self):
+        """
+        Prepares connections and credentials of a long-running process before the first request.
+        :return:
+        """
+
     @staticmethod
     def generate_totals(invoices: List[Invoice], expenses: List[Expense]) -> Totals:
         """
@@ -41,20 +160,4 @@ class Processor:
         :param expenses:
         :return:
         """
-        total = sum(i.total for i in invoices)
-        subtotal = sum(i.subtotal for i in invoices)
-        tax = sum(i.tax for i in invoices)
-        supplier_total = sum(i.total for i in expenses)
-        supplier_subtotal = sum(i.subtotal for i in expenses)
-        supplier_tax = sum(i.tax for i in expenses)
-
-        return Totals(
-            total=total,
-            subtotal=subtotal,
-            tax=tax,
-            supplier_total=supplier_total,
-            supplier_subtotal=supplier_subtotal,
-            supplier_tax=supplier_tax,
-            total_diff=total - supplier_total,
-            tax_diff=tax - supplier_tax
-        )
+        return compute_totals(invoices, expenses)
@@ -0,0 +1,45 @@
+import importlib
+from dataclasses import replace
+from typing import Dict
+
+from src.dtos import Config
+from src.instrumentation import Instrumentation
+from src.processor import Processor
+
+# processor name -> "module.Class", the module is imported only when the processor is selected
+PROCESSORS: Dict[str, str] = {
+    "fakturoid": "src.fakturoid_processor.FakturoidProcessor",
+    "file": "src.file_processor.FileProcessor",
+}
+
+
+def register_processor(name: str, class_path: str):
+    """
+    Registers a data source processor selectable by the config processor field.
+    :param name:
+    :param class_path: module and class name of a Processor with a from_config static method
+    :return:
+    """
+    PROCESSORS[name] = class_path
+
+
+def create_processor(config: Config) -> Processor:
+    """
+    Processor selected by the config, its module is imported on the first use.
+    Several processors of the config processors field are merged into one.
+    :param config:
+    :return:
+    """
+    if config.processors:
+        # imported by configs merging processors only, as the processors themselves
+        from src.merged_processor import MergedProcessor  # pylint: disable=import-outside-toplevel
+        processors = [create_processor(replace(config, processor=name, processors=None)) for name in config.processors]
+        return MergedProcessor(processors, workers=config.workers,
+                               instrumentation=Instrumentation(enabled=config.instrumentation))
+
+    class_path = PROCESSORS.get(config.processor, None)
+    if class_path is None:
+        raise ValueError(f"Unknown processor {config.processor}, use one of {', '.join(sorted(PROCESSORS))}.")
+    module_name, class_name = class_path.rsplit(".", 1)
+    processor_class = getattr(importlib.import_module(module_name), class_name)
+    return processor_class.from_config(config)
@@ -1,5 +1,7 @@
 from qrplatba import QRPlatbaGenerator
 
+from src.atomic_files import open_atomically
+
 
 def generate_qr_code(
         account: str,
@@ -21,7 +23,8 @@ def generate_qr_code(
         x_ss=ss,
     )
     img = generator.make_image()
-    img.save(file_name)
+    with open_atomically(file_name, "wb") as f:
+        img.save(f)
     # # optional: custom box size and border
     # img = generator.make_image(box_size=20, border=4)
     # # optional: get SVG as a string.
@@ -0,0 +1,175 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+# Fakturoid allows 400 requests per 60 seconds and account, the X-RateLimit-Policy header says so,
+# so requests are not throttled before the first policy, e.g., against mocked HTTP or the stand-in server
+DEFAULT_WINDOW = 60
+# pause after a 429 without Retry-After, doubled by every further 429
+DEFAULT_PAUSE = 1
+MAX_PAUSE = 60
+# share of the max rate regained by every successful response after a 429
+RECOVERY = 0.05
+TOO_MANY_REQUESTS = 429
+
+limiter_cache: Dict[str, "RateLimiter"] = {}
+_limiter_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Adaptive token bucket of one account shared by all its requests of the process.
+    The rate follows the X-RateLimit-Policy header, the bucket is drained to the X-RateLimit remaining count
+    and calls are paused until the window resets or Retry-After passes. After a 429, the rate is halved
+    and regained gradually by successful responses. Without a quota, calls are only paused until a policy is seen.
+    """
+
+    def __init__(self, quota: Optional[int] = None, window: float = DEFAULT_WINDOW,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        :param quota: requests per window until the policy header says otherwise, None for no limit until then
+        :param window: window in seconds
+        :param clock:
+        :param sleep:
+        """
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._max_rate: Optional[float] = quota / window if quota is not None else None
+        self._rate = self._max_rate
+        self._capacity = float(quota) if quota is not None else 0.0
+        self._tokens = self._capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._pause = DEFAULT_PAUSE
+
+    @property
+    def rate(self) -> Optional[float]:
+        """
+        Current requests per second, None when not limited.
+        :return:
+        """
+        return self._rate
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+        :return:
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._rate is None:
+                        return
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self._rate
+            self._sleep(wait)
+
+    def update(self, status_code: int, headers) -> bool:
+        """
+        Adapts the bucket to a response.
+        :param status_code:
+        :param headers: response headers, case-insensitive
+        :return: whether the response was rate limited
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+
+            policy = _parse_limit(headers.get("X-RateLimit-Policy"))
+            if policy is not None and policy.get("q", 0) > 0 and policy.get("w", 0) > 0:
+                if self._rate is None:
+                    self._rate = policy["q"] / policy["w"]
+                    self._tokens = policy["q"]
+                self._max_rate = policy["q"] / policy["w"]
+                self._capacity = policy["q"]
+
+            limit = _parse_limit(headers.get("X-RateLimit"))
+            if limit is not None and "r" in limit:
+                self._tokens = min(self._tokens, limit["r"])
+                if limit["r"] <= 0 and "t" in limit:
+                    self._pause_until(now + limit["t"])
+
+            if status_code == TOO_MANY_REQUESTS:
+                retry_after = _parse_retry_after(headers.get("Retry-After"))
+                self._pause_until(now + (retry_after if retry_after is not None else self._pause))
+                self._pause = min(self._pause * 2, MAX_PAUSE)
+                if self._rate is not None:
+                    self._rate = max(self._rate / 2, self._max_rate / 100)
+                    self._tokens = min(self._tokens, 0)
+                return True
+
+            self._pause = DEFAULT_PAUSE
+            if self._rate is not None:
+                self._rate = min(self._max_rate, self._rate + self._max_rate * RECOVERY)
+            return False
+
+    def _refill(self, now: float):
+        if self._rate is None:
+            self._updated = now
+            return
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _pause_until(self, until: float):
+        self._paused_until = max(self._paused_until, until)
+
+
+def get_rate_limiter(key: str) -> RateLimiter:
+    """
+    Rate limiter shared by all requests of the key, e.g., of an account URL, within the process.
+    :param key:
+    :return:
+    """
+    with _limiter_lock:
+        limiter = limiter_cache.get(key, None)
+        if limiter is None:
+            limiter = RateLimiter()
+            limiter_cache[key] = limiter
+        return limiter
+
+
+def _parse_limit(value: Optional[str]) -> Optional[Dict[str, float]]:
+    """
+    Parameters of the first item of a rate limit header, e.g., default;q=400;w=60 or default;r=399;t=55.
+    :param value:
+    :return:
+    """
+    if not value:
+        return None
+    parameters = {}
+    for part in value.split(",")[0].split(";")[1:]:
+        name, _, number = part.strip().partition("=")
+        try:
+            parameters[name] = float(number)
+        except ValueError:
+            continue
+    return parameters
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After in seconds, given either as seconds or as an HTTP date.
+    :param value:
+    :return:
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,280 @@
+import argparse
+import importlib
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from logging import Logger
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from src.dtos import Config, Period, Totals
+from src.expense_files import ExpenseFilesError
+from src.generator import (UnknownVatNumbersError, generate_report, get_qr_code_file_name, get_report_dir_name,
+                           save_qr_code)
+from src.logger import get_logger
+from src.processor import Processor
+from src.processors import create_processor
+from src.template_engine import get_template_env
+
+DEFAULT_PORT = 8041
+# accepted requests waiting for a worker, further requests are answered by 503 at once
+DEFAULT_BACKLOG = 16
+# failures of a request, e.g., an invalid config, a failed source request or unreadable expense files,
+# requests errors are OSErrors
+REQUEST_ERRORS = (OSError, ValueError, KeyError, TypeError, AttributeError, ExpenseFilesError)
+
+
+class ReportService:
+    """
+    Configs and their processors kept warm between requests, so a request pays neither imports, nor config parsing,
+    nor the token handshake, nor template compilation. A changed config file is reloaded on the next request.
+    """
+
+    def __init__(self, config_files: List[str], logger: Logger):
+        """
+        :param config_files: configs selectable by their file name without extension, the first one is the default
+        :param logger:
+        """
+        if not config_files:
+            raise ValueError("The service needs at least one config file.")
+        self._config_files = {os.path.splitext(os.path.basename(f))[0]: f for f in config_files}
+        self._default = os.path.splitext(os.path.basename(config_files[0]))[0]
+        self._logger = logger
+        self._lock = threading.Lock()
+        # config name -> config file mtime, config and processor
+        self._tenants: Dict[str, Tuple[float, Config, Processor]] = {}
+        self._period_locks: Dict[Tuple[str, int], threading.Lock] = {}
+
+    @property
+    def config_names(self) -> List[str]:
+        return list(self._config_files)
+
+    def warm_up(self):
+        """
+        Loads configs, imports and compiles templates, imports the QR code library and obtains tokens.
+        Failing token requests are logged, they are retried by the first request of the config.
+        :return:
+        """
+        importlib.import_module("src.qr_payment")
+        jinja_env = get_template_env()
+        for template_name in jinja_env.list_templates(filter_func=lambda name: name.endswith(".xml")):
+            jinja_env.get_template(template_name)
+        for name in self._config_files:
+            _, processor = self.get(name)
+            try:
+                processor.warm_up()
+            except REQUEST_ERRORS as ex:
+                self._logger.warning("Warming up processor of %s failed: %s: %s", name, type(ex).__name__, ex)
+
+    def get(self, name: Optional[str] = None) -> Tuple[Config, Processor]:
+        """
+        Config and processor of the name, reloaded when the config file changed.
+        :param name: None for the default config
+        :return:
+        :raises KeyError: for an unknown config
+        """
+        name = name or self._default
+        config_file = self._config_files[name]
+        mtime = os.path.getmtime(config_file)
+        with self._lock:
+            tenant = self._tenants.get(name, None)
+            if tenant is None or tenant[0] != mtime:
+                with open(config_file, encoding="utf-8") as f:
+                    # run records of concurrent requests would mix, so the service measures nothing
+                    config = replace(Config.from_dict(json.load(f)), instrumentation=False)
+                tenant = (mtime, config, create_processor(config))
+                self._tenants[name] = tenant
+            return tenant[1], tenant[2]
+
+    def totals(self, period: Period, name: Optional[str] = None) -> dict:
+        config, processor = self.get(name)
+        invoices, expenses = processor.fetch(replace(config, period=period))
+        return _result(period, processor.generate_totals(invoices, expenses), len(invoices), len(expenses))
+
+    def reports(self, period: Period, name: Optional[str] = None) -> dict:
+        config, processor = self.get(name)
+        config = replace(config, period=period)
+        with self._period_lock(name, period):
+            totals = generate_report(processor, config, self._logger, qr_code=True)
+        result = _result(period, totals)
+        result["report_dir"] = get_report_dir_name(config)
+        result["qr_code"] = get_qr_code_file_name(config) if totals is not None else None
+        return result
+
+    def qr_code(self, period: Period, name: Optional[str] = None) -> dict:
+        config, processor = self.get(name)
+        config = replace(config, period=period)
+        invoices, expenses = processor.fetch(config)
+        totals = processor.generate_totals(invoices, expenses)
+        result = _result(period, totals, len(invoices), len(expenses))
+        if not invoices and not expenses:
+            # nothing to pay, as for reports of such a period
+            result["qr_code"] = None
+            return result
+        with self._period_lock(name, period):
+            result["qr_code"] = save_qr_code(config, totals)
+        return result
+
+    def _period_lock(self, name: Optional[str], period: Period) -> threading.Lock:
+        # files of a period are written by one request at a time, so their manifest keeps all hashes
+        key = (name or self._default, period.index())
+        with self._lock:
+            return self._period_locks.setdefault(key, threading.Lock())
+
+
+class ReportServer(HTTPServer):
+    """
+    HTTP server of a report service handling requests by a bounded pool of workers.
+    """
+
+    def __init__(self, address: Tuple[str, int], service: ReportService, workers: int = 4,
+                 backlog: int = DEFAULT_BACKLOG):
+        super().__init__(address, _Handler)
+        self.service = service
+        self._workers = max(1, workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # requests handled or waiting for a worker, counted under the lock as they finish on worker threads
+        self._capacity = self._workers + backlog
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        # workers live while serving, accepted requests are finished before it returns
+        with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="report-service") as self._executor:
+            super().serve_forever(poll_interval)
+
+    def process_request(self, request: socket.socket, client_address):
+        if not self._reserve():
+            body = json.dumps({"error": "busy"}).encode("utf-8")
+            try:
+                request.sendall(b"HTTP/1.0 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                                b"Retry-After: 1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request: socket.socket, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # logged with the traceback instead of being lost in the future of the worker
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._pending_lock:
+                self._pending -= 1
+
+    def handle_error(self, request, client_address):
+        get_logger("fs-reports").exception("Request of %s:%s failed.", *client_address[:2])
+
+    def _reserve(self) -> bool:
+        with self._pending_lock:
+            if self._pending >= self._capacity:
+                return False
+            self._pending += 1
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints of the report service, errors of a request are answered by their status and message.
+    """
+
+    server: ReportServer
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        if url.path == "/health":
+            return self._send(HTTPStatus.OK, {"configs": self.server.service.config_names})
+        if url.path == "/totals":
+            return self._handle(self.server.service.totals, url.query)
+        self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint {url.path}."})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path == "/reports":
+            return self._handle(self.server.service.reports, url.query)
+        if url.path == "/qr":
+            return self._handle(self.server.service.qr_code, url.query)
+        self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint {url.path}."})
+
+    def _handle(self, action, query: str):
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        try:
+            period = Period.parse(params["period"])
+            if not 1 <= period.month <= 12:
+                raise ValueError(f"Invalid month {period.month}.")
+        except (KeyError, ValueError):
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": "Set period as YYYY-MM."})
+        name = params.get("config")
+        if name is not None and name not in self.server.service.config_names:
+            return self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown config {name}."})
+
+        try:
+            self._send(HTTPStatus.OK, action(period, name))
+        except UnknownVatNumbersError as ex:
+            self._send(HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(ex)})
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            # e.g., an unopenable store, the client gets the error instead of a dropped connection
+            get_logger("fs-reports").exception("Request %s failed.", self.path)
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(ex).__name__}: {ex}"})
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, message_format, *args):
+        get_logger("fs-reports").debug("%s %s", self.address_string(), message_format % args)
+
+
+def _result(period: Period, totals: Optional[Totals], invoices_count: Optional[int] = None,
+            expenses_count: Optional[int] = None) -> dict:
+    result = {"period": f"{period.year}-{period.month:02}", "totals": asdict(totals) if totals is not None else None}
+    if invoices_count is not None:
+        result["invoices"] = invoices_count
+        result["expenses"] = expenses_count
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves reports, totals and QR payment codes over local HTTP.")
+    parser.add_argument("configs", nargs="*", default=["../config.json"],
+                        help="config files selectable by the config parameter, the first one is the default")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=4, help="requests handled concurrently")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG, help="requests waiting for a worker")
+    args = parser.parse_args()
+    logger = get_logger("fs-reports")
+
+    service = ReportService(args.configs, logger)
+    service.warm_up()
+    server = ReportServer((args.host, args.port), service, args.workers, args.backlog)
+    logger.info("Serving %s on %s.", ", ".join(service.config_names), server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
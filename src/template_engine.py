@@ -0,0 +1,79 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from jinja2 import (ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader,
+                    StrictUndefined, select_autoescape)
+
+TEMPLATES_DIR = "../templates"
+BYTECODE_CACHE_DIR = "~/.cache/fs-reports/templates"
+
+env_cache: Dict[Tuple[str, Optional[str], Optional[str]], Environment] = {}
+_env_lock = threading.Lock()
+
+
+def get_template_env(templates_dir: str = TEMPLATES_DIR,
+                     bytecode_cache_dir: Optional[str] = BYTECODE_CACHE_DIR,
+                     compiled_dir: Optional[str] = None) -> Environment:
+    """
+    Template environment shared by the whole process, so templates are compiled at most once per process.
+    Compiled templates are also kept in the on-disk bytecode cache, which is keyed by the template source hash,
+    and a changed template file is detected by its mtime and recompiled.
+    :param templates_dir:
+    :param bytecode_cache_dir: None disables the bytecode cache
+    :param compiled_dir: templates precompiled by compile_templates, preferred over the template files
+    :return:
+    """
+    key = (templates_dir, bytecode_cache_dir, compiled_dir)
+    with _env_lock:
+        env = env_cache.get(key, None)
+        if env is not None:
+            return env
+
+        bytecode_cache = None
+        if bytecode_cache_dir is not None:
+            bytecode_cache_dir = os.path.expanduser(bytecode_cache_dir)
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+        loader = FileSystemLoader(templates_dir)
+        if compiled_dir is not None and os.path.isdir(compiled_dir):
+            loader = ChoiceLoader([ModuleLoader(compiled_dir), loader])
+
+        env = _create_env(loader, bytecode_cache)
+
+        env_cache[key] = env
+
+        return env
+
+
+def get_template_hash(env: Environment, name: str) -> str:
+    """
+    SHA-256 of the file the template is loaded from, a template file or its precompiled module.
+    :param env:
+    :param name:
+    :return:
+    """
+    with open(env.get_template(name).filename, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_templates(target_dir: str, templates_dir: str = TEMPLATES_DIR):
+    """
+    Precompiles all templates into python modules loadable via get_template_env compiled_dir.
+    Recompile after changing the templates, the precompiled modules are not checked for changes.
+    :param target_dir:
+    :param templates_dir:
+    :return:
+    """
+    _create_env(FileSystemLoader(templates_dir), None).compile_templates(target_dir, zip=None)
+
+
+def _create_env(loader, bytecode_cache: Optional[FileSystemBytecodeCache]) -> Environment:
+    return Environment(
+        loader=loader,
+        autoescape=select_autoescape(["xml"]),
+        undefined=StrictUndefined,
+        bytecode_cache=bytecode_cache
+    )
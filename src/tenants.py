@@ -0,0 +1,118 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.dtos import Config, Totals
+from src.generator import generate_report, save_run_record
+from src.logger import get_logger
+from src.processors import create_processor
+
+
+@dataclass
+class TenantResult:
+    """
+    Result of report generation of one config.
+    """
+    config_file: str
+    totals: Optional[Totals]
+    seconds: float
+    error: Optional[str] = None
+
+
+def find_config_files(paths: List[str]) -> List[str]:
+    """
+    Config files given directly or as *.json files of given directories.
+    :param paths:
+    :return:
+    """
+    config_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            config_files.extend(sorted(glob.glob(os.path.join(path, "*.json"))))
+        else:
+            config_files.append(path)
+    return config_files
+
+
+def generate_tenant(config_file: str) -> TenantResult:
+    """
+    Generates reports and QR payment code of one config, failures are returned instead of raised.
+    :param config_file:
+    :return:
+    """
+    started = time.perf_counter()
+    logger = get_logger("fs-reports")
+    try:
+        with open(config_file, encoding="utf-8") as f:
+            config: Config = Config.from_dict(json.load(f))
+        processor = create_processor(config)
+        totals = generate_report(processor, config, logger, qr_code=True)
+        save_run_record(processor, config)
+        return TenantResult(config_file, totals, time.perf_counter() - started)
+    # any failure, e.g., an invalid config, a failed request or an unopenable store, fails only its tenant
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        logger.exception("Report of %s failed.", config_file)
+        return TenantResult(config_file, None, time.perf_counter() - started, f"{type(ex).__name__}: {ex}")
+
+
+def generate_tenants(config_files: List[str], workers: int) -> List[TenantResult]:
+    """
+    Generates reports of all configs in a process pool.
+    :param config_files:
+    :param workers: max number of processes
+    :return: results in the order of config files
+    """
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(generate_tenant, config_file) for config_file in config_files]
+        results = []
+        for config_file, future in zip(config_files, futures):
+            try:
+                results.append(future.result())
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                # the worker process died, e.g., killed for lack of memory, or the result could not be returned
+                results.append(TenantResult(config_file, None, 0, f"{type(ex).__name__}: {ex}"))
+        return results
+
+
+def format_summary(results: List[TenantResult]) -> str:
+    """
+    Summary table of totals and timings.
+    :param results:
+    :return:
+    """
+    header = ("Config", "Total", "Tax", "Supplier total", "Supplier tax", "Tax diff", "Seconds", "Status")
+    rows = [header]
+    for result in results:
+        totals = result.totals
+        values = (totals.total, totals.tax, totals.supplier_total, totals.supplier_tax, totals.tax_diff) \
+            if totals is not None else ("",) * 5
+        status = result.error if result.error is not None else "OK" if totals is not None else "No documents"
+        rows.append((result.config_file, *(str(v) for v in values), f"{result.seconds:.2f}", status))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header) - 1)]
+    return "\n".join(
+        " | ".join([cell.ljust(width) for cell, width in zip(row, widths)] + [row[-1]]) for row in rows
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates reports of many configs in parallel.")
+    parser.add_argument("paths", nargs="+", help="config files or directories of config files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="max number of parallel processes")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = generate_tenants(find_config_files(args.paths), args.workers)
+
+    print(format_summary(results))
+    print(f"{len(results)} configs, {sum(r.error is not None for r in results)} failed, "
+          f"{time.perf_counter() - started:.2f} s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, the cache is then guarded within the process only
+    fcntl = None
+
+
+class TokenCache:
+    """
+    OAuth token cache stored on disk, so subsequent runs and parallel workers share one token.
+    """
+
+    def __init__(self, directory: str, key: str):
+        """
+        :param directory: cache directory, created when missing
+        :param key: identifies the token owner, e.g., the API root and client id, only its hash is used
+            in the file name
+        """
+        self._directory = os.path.expanduser(directory)
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        self._path = os.path.join(self._directory, f"token-{name}.json")
+
+    @contextmanager
+    def locked(self) -> Iterator["TokenCache"]:
+        """
+        Holds an exclusive lock on the cache, so only one process refreshes the token.
+        :return:
+        """
+        os.makedirs(self._directory, mode=0o700, exist_ok=True)
+        with open(f"{self._path}.lock", "a", encoding="utf-8") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self, now: datetime) -> Optional[Tuple[str, datetime]]:
+        """
+        Cached token and its expiration, None when there is no token valid at the given time.
+        :param now:
+        :return:
+        """
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            expires_at = datetime.fromisoformat(data["expires_at"])
+            token = data["access_token"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if expires_at <= now:
+            return None
+        return token, expires_at
+
+    def discard(self, token: str):
+        """
+        Removes the cached token when it is the given one, e.g., revoked before its expiration.
+        A token refreshed meanwhile by another process is kept.
+        :param token:
+        :return:
+        """
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                cached = json.load(f).get("access_token")
+        except (OSError, ValueError, AttributeError):
+            return
+        if cached == token:
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
+
+    def save(self, token: str, expires_at: datetime):
+        tmp_path = f"{self._path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"access_token": token, "expires_at": expires_at.isoformat()}, f)
+        os.replace(tmp_path, self._path)
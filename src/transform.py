@@ -0,0 +1,65 @@
+import math
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+# field name -> (source key or None, converter of the source value)
+FieldSpecs = Dict[str, Tuple[Optional[str], Callable[[Any], Any]]]
+# field name -> function of already converted values
+DerivedSpecs = Dict[str, Callable[[Dict[str, Any]], Any]]
+
+
+@lru_cache(maxsize=8192)
+def parse_date(value: str) -> datetime:
+    """
+    Parses YYYY-MM-DD date, memoized as documents share few distinct dates.
+    :param value:
+    :return:
+    """
+    return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def parse_amount(value: Any) -> int:
+    """
+    Amount rounded up to whole units.
+    :param value:
+    :return:
+    """
+    return math.ceil(float(value))
+
+
+def identity(value: Any) -> Any:
+    return value
+
+
+def constant(value: Any) -> Callable[[Any], Any]:
+    return lambda _: value
+
+
+class Transformer(Generic[T]):
+    """
+    Transforms source records into dataclass instances as described by field specs.
+    Every source value is read and converted exactly once, derived fields are computed from converted values.
+    """
+
+    def __init__(self, cls: Type[T], fields: FieldSpecs, derived: Optional[DerivedSpecs] = None):
+        self._cls = cls
+        self._sourced = [(name, source, convert) for name, (source, convert) in fields.items() if source is not None]
+        self._constants = {name: convert(None) for name, (source, convert) in fields.items() if source is None}
+        self._derived = list((derived or {}).items())
+
+    def __call__(self, records: Iterable[dict]) -> List[T]:
+        cls = self._cls
+        sourced = self._sourced
+        constants = self._constants
+        derived = self._derived
+        result = []
+        for record in records:
+            values = {name: convert(record[source]) for name, source, convert in sourced}
+            values.update(constants)
+            for name, derive in derived:
+                values[name] = derive(values)
+            result.append(cls(**values))
+        return result
@@ -0,0 +1,174 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.dtos import Config
+
+_MAGIC = b"FSVAT1\0\0"
+_COUNT = struct.Struct("<I")
+_SEPARATOR = b"\t"
+
+registry_cache: Dict[str, "IndexedVatRegistry"] = {}
+_registry_lock = threading.Lock()
+
+
+class VatRegistry:
+    """
+    Registry of valid VAT numbers and names of their owners.
+    """
+
+    def get_name(self, number: str) -> Optional[str]:
+        """
+        Name of the VAT number owner, None for an unknown number.
+        :param number:
+        :return:
+        """
+
+    def find_unknown(self, numbers: Iterable[str]) -> Set[str]:
+        """
+        All unknown numbers, each distinct number is looked up once.
+        :param numbers:
+        :return:
+        """
+        return {number for number in set(numbers) if self.get_name(number) is None}
+
+
+class DictVatRegistry(VatRegistry):
+    """
+    In-memory registry, e.g., of VAT numbers listed in the config.
+    """
+
+    def __init__(self, names: Dict[str, str]):
+        self._names = names
+
+    def get_name(self, number: str) -> Optional[str]:
+        return self._names.get(number)
+
+    def find_unknown(self, numbers: Iterable[str]) -> Set[str]:
+        return set(numbers).difference(self._names.keys())
+
+
+class IndexedVatRegistry(VatRegistry):
+    """
+    Registry backed by an index file built by build_index, memory-mapped on the first lookup.
+    Lookups are binary searches over the mapped file, so nothing is parsed up front.
+    """
+
+    def __init__(self, file_name: str):
+        self._file_name = file_name
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._count = 0
+        self._data_start = 0
+
+    def get_name(self, number: str) -> Optional[str]:
+        if number is None:
+            return None
+        self._open()
+        key = number.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            entry_number, name = self._entry(middle)
+            if entry_number < key:
+                low = middle + 1
+            elif entry_number > key:
+                high = middle
+            else:
+                return name.decode("utf-8")
+        return None
+
+    def __len__(self) -> int:
+        self._open()
+        return self._count
+
+    def _open(self):
+        if self._map is not None:
+            return
+        with self._lock:
+            if self._map is not None:
+                return
+            with open(self._file_name, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if mapped[:len(_MAGIC)] != _MAGIC:
+                mapped.close()
+                raise ValueError(f"{self._file_name} is not a VAT registry index.")
+            self._count = _COUNT.unpack_from(mapped, len(_MAGIC))[0]
+            self._data_start = len(_MAGIC) + _COUNT.size * (self._count + 2)
+            self._map = mapped
+
+    def _entry(self, index: int) -> Tuple[bytes, bytes]:
+        start, end = struct.unpack_from("<II", self._map, len(_MAGIC) + _COUNT.size * (index + 1))
+        entry = self._map[self._data_start + start:self._data_start + end]
+        number, name = entry.split(_SEPARATOR, 1)
+        return number, name
+
+
+def build_index(names: Dict[str, str], file_name: str):
+    """
+    Writes VAT numbers and names into an index file: magic, count, count + 1 offsets and entries sorted by number.
+    :param names: name per VAT number
+    :param file_name:
+    :return:
+    """
+    # the separator sorts before any character of a number, so entries sort by their numbers
+    entries = sorted(number.encode("utf-8") + _SEPARATOR + name.encode("utf-8") for number, name in names.items())
+    offsets = [0]
+    for entry in entries:
+        offsets.append(offsets[-1] + len(entry))
+
+    tmp_name = f"{file_name}.tmp"
+    with open(tmp_name, "wb") as f:
+        f.write(_MAGIC)
+        f.write(_COUNT.pack(len(entries)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        for entry in entries:
+            f.write(entry)
+    os.replace(tmp_name, file_name)
+
+
+def get_indexed_registry(file_name: str) -> IndexedVatRegistry:
+    """
+    Registry of the index file shared by the whole process.
+    :param file_name:
+    :return:
+    """
+    with _registry_lock:
+        registry = registry_cache.get(file_name, None)
+        if registry is None:
+            registry = IndexedVatRegistry(file_name)
+            registry_cache[file_name] = registry
+        return registry
+
+
+def get_client_vat_registry(config: Config) -> VatRegistry:
+    if config.valid_client_vat_numbers_file is not None:
+        return get_indexed_registry(config.valid_client_vat_numbers_file)
+    return DictVatRegistry({vat.number: vat.name for vat in config.valid_client_vat_numbers})
+
+
+def get_supplier_vat_registry(config: Config) -> VatRegistry:
+    if config.valid_supplier_vat_numbers_file is not None:
+        return get_indexed_registry(config.valid_supplier_vat_numbers_file)
+    return DictVatRegistry({vat.number: vat.name for vat in config.valid_supplier_vat_numbers})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds a VAT registry index from a JSON list of names and numbers.")
+    parser.add_argument("source", help="JSON file with [{\"name\": ..., \"number\": ...}, ...]")
+    parser.add_argument("index", help="index file to write")
+    args = parser.parse_args()
+
+    with open(args.source, encoding="utf-8") as f:
+        entries: List[dict] = json.load(f)
+
+    build_index({str(entry["number"]): str(entry["name"]) for entry in entries}, args.index)
+    print(f"{len(entries)} VAT numbers written into {args.index}.")
+
+
+if __name__ == "__main__":
+    main()
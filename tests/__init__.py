@@ -1,4 +1,5 @@
 import sys
 
 sys.path.append("..")
-sys.path.append("../src")
\ No newline at end of file
+sys.path.append("../src")
+sys.path.append("../benchmarks")
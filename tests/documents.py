@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from src.dtos import Expense, Invoice
+
+
+def make_invoice(**fields) -> Invoice:
+    """
+    Invoice of June 2023 for 100 + 21 tax, fields override the defaults.
+    :param fields:
+    :return:
+    """
+    return Invoice(**{
+        "due_on": datetime(2023, 6, 30),
+        "id": "1",
+        "issued_on": datetime(2023, 6, 1),
+        "note": "",
+        "number": "",
+        "order_number": "",
+        "client_registration_number": "",
+        "subtotal": 100,
+        "tax": 21,
+        "taxable_fulfillment_due": datetime(2023, 6, 15),
+        "total": 121,
+        "html_url": "",
+        "variable_symbol": "",
+        "client_vat_number": "",
+        "vat_price_mode": "",
+        **fields
+    })
+
+
+def make_expense(**fields) -> Expense:
+    """
+    Expense of June 2023 for 100 + 21 tax, fields override the defaults.
+    :param fields:
+    :return:
+    """
+    return Expense(**{
+        "document_type": "",
+        "due_on": datetime(2023, 6, 30),
+        "id": "1",
+        "issued_on": datetime(2023, 6, 1),
+        "original_number": "",
+        "number": "",
+        "supplier_registration_number": "",
+        "supplier_vat_number": "",
+        "subtotal": 100,
+        "tax": 21,
+        "taxable_fulfillment_due": datetime(2023, 6, 15),
+        "total": 121,
+        "html_url": "",
+        "variable_symbol": "",
+        "vat_price_mode": "",
+        **fields
+    })
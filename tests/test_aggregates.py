@@ -0,0 +1,26 @@
+from src.aggregates import MonthlyAggregates
+from src.dtos import Period, Totals
+
+
+def _totals(total: float, tax: float, supplier_total: float, supplier_tax: float) -> Totals:
+    return Totals(total=total, subtotal=total - tax, tax=tax, supplier_total=supplier_total,
+                  supplier_subtotal=supplier_total - supplier_tax, supplier_tax=supplier_tax,
+                  total_diff=total - supplier_total, tax_diff=tax - supplier_tax)
+
+
+def test_should_total_month_ranges(tmp_path):
+    aggregates = MonthlyAggregates(str(tmp_path / "aggregates.sqlite"))
+    aggregates.update(Period(2023, 1), _totals(121, 21, 12.1, 2.1), 1, 1)
+    aggregates.update(Period(2023, 3), _totals(242, 42, 0, 0), 2, 0)
+    aggregates.update(Period(2023, 12), _totals(1210, 210, 24.2, 4.2), 3, 2)
+
+    totals, invoices_count, expenses_count = aggregates.totals_between(Period(2023, 1), Period(2023, 3))
+    assert (totals.total, totals.tax, totals.supplier_total, totals.tax_diff) == (363, 63, 12.1, 60.9)
+    assert (invoices_count, expenses_count) == (3, 1)
+    assert aggregates.totals_between(Period(2023, 4), Period(2023, 11))[0].total == 0
+
+    aggregates.update(Period(2023, 3), _totals(121, 21, 0, 0), 1, 0)
+    reopened = MonthlyAggregates(str(tmp_path / "aggregates.sqlite"))
+    totals, invoices_count, _ = reopened.totals_between(Period(2022, 1), Period(2024, 1))
+    assert (totals.total, totals.supplier_tax, invoices_count) == (1452, 6.3, 5)
+    assert reopened.periods() == [Period(2023, 1), Period(2023, 3), Period(2023, 12)]
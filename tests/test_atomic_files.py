@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from src.atomic_files import write_atomically
+
+
+def test_should_write_chunks_atomically(tmp_path):
+    file_name = str(tmp_path / "report.xml")
+    write_atomically(file_name, (f"<row id=\"{i}\"/>\n" for i in range(3)))
+
+    with open(file_name, encoding="utf-8") as f:
+        assert f.read() == "<row id=\"0\"/>\n<row id=\"1\"/>\n<row id=\"2\"/>\n"
+
+
+def test_should_keep_previous_file_when_rendering_fails(tmp_path):
+    file_name = str(tmp_path / "report.xml")
+    write_atomically(file_name, ["previous"])
+
+    def failing_chunks():
+        yield "partial"
+        raise ValueError("rendering failed")
+
+    with pytest.raises(ValueError):
+        write_atomically(file_name, failing_chunks())
+
+    with open(file_name, encoding="utf-8") as f:
+        assert f.read() == "previous"
+    assert os.listdir(tmp_path) == ["report.xml"]
@@ -0,0 +1,73 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from src.expense_files import ExpenseFilesError, file_cache, load_expense_file, load_expense_files
+
+_EXPENSE = {
+    "due_on": "2023-06-19",
+    "issued_on": "2023-06-05",
+    "original_number": "25010038",
+    "supplier_registration_number": "12345678",
+    "supplier_vat_number": "CZ12345678",
+    "subtotal": 100,
+    "taxable_fulfillment_due": "2023-06-05",
+    "total": 121,
+    "variable_symbol": "25010038",
+}
+
+
+def _write_files(directory) -> list:
+    json_file = directory / "a.json"
+    json_file.write_text(json.dumps([_EXPENSE]))
+    jsonl_file = directory / "b.jsonl"
+    jsonl_file.write_text(json.dumps({**_EXPENSE, "variable_symbol": "2"}) + "\n\n")
+    csv_file = directory / "c.csv"
+    csv_file.write_text(",".join(_EXPENSE) + "\n" + ",".join(str(v) for v in {**_EXPENSE, "total": "121.5"}.values()))
+    return [str(json_file), str(jsonl_file), str(csv_file)]
+
+
+def test_should_load_expense_files(tmp_path):
+    expenses = load_expense_files(_write_files(tmp_path), workers=3)
+
+    assert [e.id for e in expenses] == ["12345678-25010038", "12345678-2", "12345678-25010038"]
+    assert [e.tax for e in expenses] == [21, 21, 22]
+    assert expenses[2].taxable_fulfillment_due == datetime(2023, 6, 5)
+
+
+def test_should_reparse_changed_files_only(tmp_path):
+    file_name = _write_files(tmp_path)[0]
+    expenses = load_expense_file(file_name)
+    assert load_expense_file(file_name) is expenses
+
+    with open(file_name, "w") as f:
+        json.dump([_EXPENSE, _EXPENSE], f)
+    os.utime(file_name, ns=(0, 0))
+
+    assert len(load_expense_file(file_name)) == 2
+    assert file_cache[file_name][0] == (0, os.stat(file_name).st_size)
+
+
+def test_should_report_every_invalid_file(tmp_path):
+    file_names = _write_files(tmp_path)
+    (tmp_path / "d.json").write_text("[{")
+    (tmp_path / "e.csv").write_text("total\n1")
+
+    with pytest.raises(ExpenseFilesError) as ex:
+        load_expense_files(file_names + [str(tmp_path / "d.json"), str(tmp_path / "e.csv")], workers=2)
+
+    assert sorted(os.path.basename(f) for f in ex.value.errors) == ["d.json", "e.csv"]
+    assert "d.json" in str(ex.value)
+
+
+def test_should_report_files_with_missing_values(tmp_path):
+    file_names = _write_files(tmp_path)
+    (tmp_path / "f.csv").write_text(",".join(_EXPENSE) + "\n2023-06-19,2023-06-05,25010038")
+    (tmp_path / "g.json").write_text(json.dumps([{**_EXPENSE, "subtotal": None}]))
+
+    with pytest.raises(ExpenseFilesError) as ex:
+        load_expense_files(file_names + [str(tmp_path / "f.csv"), str(tmp_path / "g.json")], workers=2)
+
+    assert sorted(os.path.basename(f) for f in ex.value.errors) == ["f.csv", "g.json"]
@@ -1,19 +1,52 @@
 import filecmp
 import json
 import os
+from datetime import date, timedelta
 from http import HTTPStatus
 from logging import Logger
+from typing import Dict, List, Optional
 
 import pytest
 
-from src.dtos import Config
+import src.generator
+from src.aggregates import MonthlyAggregates
+from src.document_store import DocumentStore
+from src.dtos import Config, Period
 from src.fakturoid_processor import FakturoidProcessor, FakturoidAuth
-from src.generator import generate_report
+from src.generator import generate_report, generate_reports, save_qr_code, save_run_record
+from src.instrumentation import Instrumentation
 from src.logger import get_logger
 
 _logger: Logger = get_logger("tests")
 
 
+def _create_processor(mocker, workers: int = 1, instrumentation: Optional[Instrumentation] = None, **kwargs) \
+        -> FakturoidProcessor:
+    mocker.patch.object(FakturoidProcessor, "_get_token", return_value="token")
+    return FakturoidProcessor(FakturoidAuth(
+        client_id="client_id",
+        client_secret="client_secret",
+        email="user@example.org",
+        slug="user"
+    ), workers=workers, instrumentation=instrumentation, **kwargs)
+
+
+def _body(documents: list) -> List[bytes]:
+    data = json.dumps(documents).encode("utf-8")
+    return [data[i:i + 100] for i in range(0, len(data), 100)]
+
+
+def _mock_pages(mocker, pages: Dict[str, List[list]]):
+    def get(_method, url, params, **_):
+        response = mocker.Mock(headers={})
+        response.status_code = HTTPStatus.OK
+        documents = pages[url.rsplit("/", 1)[-1]]
+        response.iter_content.return_value = _body(documents[params["page"] - 1] if params["page"] <= len(documents) else [])
+        return response
+
+    return mocker.patch("src.http_session.requests.Session.request", side_effect=get)
+
+
 @pytest.fixture()
 def mocked_invoices():
     with open("./test_data/invoices.json", encoding="utf-8") as f:
@@ -27,48 +60,296 @@ def mocked_expenses():
 
 
 def test_should_generate_reports(mocker, mocked_invoices, mocked_expenses):
-    processor = FakturoidProcessor(FakturoidAuth(
-        apikey="apikey",
-        email="user@example.org",
-        slug="user"
-    ))
+    processor = _create_processor(mocker)
 
-    mocked_responses = [mocker.Mock(), mocker.Mock()]
-    mocked_responses[0].json.return_value = mocked_invoices
+    mocked_responses = [mocker.Mock(headers={}), mocker.Mock(headers={})]
+    mocked_responses[0].iter_content.return_value = _body(mocked_invoices)
     mocked_responses[0].status_code = HTTPStatus.OK
-    mocked_responses[1].json.return_value = mocked_expenses
+    mocked_responses[1].iter_content.return_value = _body(mocked_expenses)
     mocked_responses[1].status_code = HTTPStatus.OK
 
-    mocker.patch("src.fakturoid_processor.requests.get", side_effect=mocked_responses)
+    mocker.patch("src.http_session.requests.Session.request", side_effect=mocked_responses)
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
 
     with open("./test_data/config1.json", encoding="utf-8") as config_file:
         config: Config = Config.from_dict(json.load(config_file))
 
     generate_report(processor, config, _logger)
 
-    assert filecmp.cmp("./test_reports/dphdp3_2023_6m.xml", "./test_data/dphdp3_2023_6m.xml")
-    assert filecmp.cmp("./test_reports/dphkh1_2023_6m.xml", "./test_data/dphkh1_2023_6m.xml")
+    assert filecmp.cmp("./test_reports/2023_06/dphdp3_2023_6m.xml", "./test_data/dphdp3_2023_6m.xml")
+    assert filecmp.cmp("./test_reports/2023_06/dphkh1_2023_6m.xml", "./test_data/dphkh1_2023_6m.xml")
 
 
 def test_should_not_generate_reports(mocker, mocked_invoices, mocked_expenses):
-    processor = FakturoidProcessor(FakturoidAuth(
-        apikey="apikey",
-        email="user@example.org",
-        slug="user"
-    ))
+    processor = _create_processor(mocker)
 
-    mocked_responses = [mocker.Mock(), mocker.Mock()]
-    mocked_responses[0].json.return_value = mocked_invoices
+    mocked_responses = [mocker.Mock(headers={}), mocker.Mock(headers={})]
+    mocked_responses[0].iter_content.return_value = _body(mocked_invoices)
     mocked_responses[0].status_code = HTTPStatus.OK
-    mocked_responses[1].json.return_value = mocked_expenses
+    mocked_responses[1].iter_content.return_value = _body(mocked_expenses)
     mocked_responses[1].status_code = HTTPStatus.OK
 
-    mocker.patch("src.fakturoid_processor.requests.get", side_effect=mocked_responses)
+    mocker.patch("src.http_session.requests.Session.request", side_effect=mocked_responses)
 
     with open("./test_data/config2.json", encoding="utf-8") as config_file:
         config: Config = Config.from_dict(json.load(config_file))
 
     generate_report(processor, config, _logger)
 
-    assert not os.path.exists("./test_reports/dphdp3_2023_4m.xml")
-    assert not os.path.exists("./test_reports/dphkh1_2023_4m.xml")
+    assert not os.path.exists("./test_reports/2023_04/dphdp3_2023_4m.xml")
+    assert not os.path.exists("./test_reports/2023_04/dphkh1_2023_4m.xml")
+
+
+def test_should_page_through_period(mocker, mocked_invoices):
+    processor = _create_processor(mocker)
+
+    full_page = [dict(mocked_invoices[2], id=i) for i in range(FakturoidProcessor.PAGE_SIZE)]
+    mocked_responses = [mocker.Mock(headers={}), mocker.Mock(headers={})]
+    mocked_responses[0].iter_content.return_value = _body(full_page)
+    mocked_responses[1].iter_content.return_value = _body(mocked_invoices)
+
+    get = mocker.patch("src.http_session.requests.Session.request", side_effect=mocked_responses)
+
+    invoices = processor.process_invoices(Period(2023, 6))
+
+    assert [i.id for i in invoices] == [1000001, 1000002]
+    assert [c.kwargs["params"]["page"] for c in get.call_args_list] == [1, 2]
+    assert get.call_args.kwargs["params"]["since"] == "2023-05-01T00:00:00"
+    assert "until" not in get.call_args.kwargs["params"]
+
+
+def test_should_limit_creation_window_when_configured(mocker, mocked_invoices):
+    processor = _create_processor(mocker, until_margin=timedelta(days=92))
+    response = mocker.Mock(headers={})
+    response.iter_content.return_value = _body(mocked_invoices)
+    get = mocker.patch("src.http_session.requests.Session.request", return_value=response)
+
+    processor.process_invoices(Period(2023, 6))
+
+    assert get.call_args.kwargs["params"]["until"] == "2023-10-01T00:00:00"
+
+
+def test_should_generate_same_reports_concurrently(mocker, mocked_invoices, mocked_expenses):
+    processor = _create_processor(mocker, workers=4)
+
+    other_period = [dict(mocked_invoices[2], id=i) for i in range(FakturoidProcessor.PAGE_SIZE)]
+    get = _mock_pages(mocker, {
+        "invoices.json": [other_period, other_period, mocked_invoices],
+        "expenses.json": [mocked_expenses],
+    })
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
+
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        config: Config = Config.from_dict(json.load(config_file))
+
+    invoices, expenses = processor.fetch(config)
+    assert [i.id for i in invoices] == [1000001, 1000002]
+    assert [e.id for e in expenses] == [1000001, 1000002]
+
+    generate_report(processor, config, _logger)
+
+    assert {c.kwargs["params"]["page"] for c in get.call_args_list} >= {1, 2, 3}
+    assert filecmp.cmp("./test_reports/2023_06/dphdp3_2023_6m.xml", "./test_data/dphdp3_2023_6m.xml")
+    assert filecmp.cmp("./test_reports/2023_06/dphkh1_2023_6m.xml", "./test_data/dphkh1_2023_6m.xml")
+
+
+def test_should_retry_server_errors(mocker, mocked_invoices):
+    processor = _create_processor(mocker)
+
+    mocked_responses = [mocker.Mock(headers={}), mocker.Mock(headers={})]
+    mocked_responses[0].status_code = HTTPStatus.SERVICE_UNAVAILABLE
+    mocked_responses[1].status_code = HTTPStatus.OK
+    mocked_responses[1].iter_content.return_value = _body(mocked_invoices)
+
+    request = mocker.patch("src.http_session.requests.Session.request", side_effect=mocked_responses)
+    sleep = mocker.patch("src.http_session.time.sleep")
+
+    invoices = processor.process_invoices(Period(2023, 6))
+
+    assert [i.id for i in invoices] == [1000001, 1000002]
+    assert request.call_count == 2
+    assert sleep.call_count == 1
+
+
+def test_should_share_cached_token(mocker, tmp_path):
+    response = mocker.Mock(headers={})
+    response.status_code = HTTPStatus.OK
+    response.json.return_value = {"access_token": "token", "expires_in": 7200}
+    request = mocker.patch("src.http_session.requests.Session.request", return_value=response)
+
+    auth = FakturoidAuth(client_id="client_id", client_secret="client_secret", email="user@example.org", slug="user")
+    tokens = [FakturoidProcessor(auth, token_cache_dir=str(tmp_path))._get_token(auth) for _ in range(3)]
+
+    assert tokens == ["token"] * 3
+    assert request.call_count == 1
+
+
+def test_should_replace_revoked_token(mocker, mocked_invoices, tmp_path):
+    tokens = iter(["revoked", "fresh"])
+
+    def request(method, _url, headers, **_):
+        response = mocker.Mock(headers={})
+        response.status_code = HTTPStatus.OK
+        if method == "POST":
+            response.json.return_value = {"access_token": next(tokens), "expires_in": 7200}
+        elif headers["Authorization"] == "Bearer revoked":
+            response.status_code = HTTPStatus.UNAUTHORIZED
+        else:
+            response.iter_content.return_value = _body(mocked_invoices)
+        return response
+
+    mocker.patch("src.http_session.requests.Session.request", side_effect=request)
+    auth = FakturoidAuth(client_id="client_id", client_secret="client_secret", email="user@example.org", slug="user")
+    processor = FakturoidProcessor(auth, token_cache_dir=str(tmp_path))
+
+    assert len(processor.process_invoices(Period(2023, 6))) == 2
+    assert processor._get_token(auth) == "fresh"
+    assert FakturoidProcessor(auth, token_cache_dir=str(tmp_path))._get_token(auth) == "fresh"
+def test_should_sync_store_incrementally(mocker, mocked_invoices, tmp_path):
+    mocker.patch.object(FakturoidProcessor, "_get_token", return_value="token")
+    auth = FakturoidAuth(client_id="client_id", client_secret="client_secret", email="user@example.org", slug="user")
+    processor = FakturoidProcessor(auth, store=DocumentStore(str(tmp_path / "documents.sqlite")))
+
+    updated = dict(mocked_invoices[1], subtotal="50000.0", total="60500.0", updated_at="2023-07-21T10:00:00.000+02:00")
+    get = _mock_pages(mocker, {"invoices.json": [mocked_invoices]})
+    assert [i.total for i in processor.process_invoices(Period(2023, 6))] == [13310, 48400]
+
+    get = _mock_pages(mocker, {"invoices.json": [[updated]]})
+    assert [i.total for i in processor.process_invoices(Period(2023, 6))] == [13310, 60500]
+    assert get.call_args.kwargs["params"] == {"updated_since": "2023-07-20T09:41:16.232+02:00", "page": 1}
+    assert [i.id for i in processor.process_invoices(Period(2023, 5))] == [1000003]
+
+
+
+def test_should_keep_documents_of_accounts_apart_in_shared_store(mocker, mocked_invoices, tmp_path):
+    mocker.patch.object(FakturoidProcessor, "_get_token", return_value="token")
+    store = DocumentStore(str(tmp_path / "documents.sqlite"))
+    processors = [FakturoidProcessor(FakturoidAuth(client_id="client_id", client_secret="client_secret",
+                                                   email="user@example.org", slug=slug), store=store)
+                  for slug in ("a", "b")]
+
+    _mock_pages(mocker, {"invoices.json": [mocked_invoices]})
+    assert len(processors[0].process_invoices(Period(2023, 6))) == 2
+
+    get = _mock_pages(mocker, {"invoices.json": []})
+    assert processors[1].process_invoices(Period(2023, 6)) == []
+    assert get.call_args.kwargs["params"] == {"page": 1}
+    assert store.get_high_water_mark("https://app.fakturoid.cz/api/v3/accounts/b", "invoices") is None
+def test_should_generate_reports_of_periods(mocker, mocked_invoices, mocked_expenses):
+    processor = _create_processor(mocker)
+
+    get = _mock_pages(mocker, {"invoices.json": [mocked_invoices], "expenses.json": [mocked_expenses]})
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
+
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        config: Config = Config.from_dict(json.load(config_file))
+
+    all_totals = generate_reports(processor, config, Period(2023, 4), Period(2023, 6), _logger)
+
+    assert get.call_count == 2
+    assert all_totals[(2023, 4)] is None
+    assert all_totals[(2023, 5)].tax == 1210
+    assert all_totals[(2023, 6)].tax == 9610
+    assert not os.path.exists("./test_reports/2023_04/dphdp3_2023_4m.xml")
+    assert os.path.exists("./test_reports/2023_05/qr_code_2023_5.svg")
+    assert filecmp.cmp("./test_reports/2023_06/dphdp3_2023_6m.xml", "./test_data/dphdp3_2023_6m.xml")
+    assert filecmp.cmp("./test_reports/2023_06/dphkh1_2023_6m.xml", "./test_data/dphkh1_2023_6m.xml")
+
+
+def test_should_save_run_record(mocker, mocked_invoices, mocked_expenses, tmp_path):
+    processor = _create_processor(mocker, instrumentation=Instrumentation())
+
+    _mock_pages(mocker, {"invoices.json": [mocked_invoices], "expenses.json": [mocked_expenses]})
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
+
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        config: Config = Config.from_dict({**json.load(config_file), "output": str(tmp_path)})
+
+    generate_report(processor, config, _logger)
+    json_file_name, prometheus_file_name = save_run_record(processor, config)
+
+    assert json_file_name == f"{tmp_path}/2023_06/run_2023_6m.json"
+    with open(json_file_name, encoding="utf-8") as f:
+        stages = {s["stage"]: s for s in json.load(f)["stages"]}
+    # reports are rendered concurrently, so their stages end in any order
+    assert list(stages)[:4] == ["fetch", "vat_validation", "totals", "control_report"]
+    assert set(list(stages)[4:]) == {"render_dphdp3", "render_dphkh1"}
+    assert stages["fetch"]["requests"] == 2
+    assert stages["fetch"]["bytes_received"] == sum(len(json.dumps(d).encode("utf-8"))
+                                                    for d in (mocked_invoices, mocked_expenses))
+    assert stages["totals"]["records"] == stages["fetch"]["records"] > 0
+    assert os.path.exists(prometheus_file_name)
+    assert processor.instrumentation.stages == []
+
+
+def test_should_skip_unchanged_reports(mocker, mocked_invoices, mocked_expenses, tmp_path):
+    processor = _create_processor(mocker)
+
+    _mock_pages(mocker, {"invoices.json": [mocked_invoices], "expenses.json": [mocked_expenses]})
+    today = mocker.patch("src.generator.date").today
+    today.return_value = date(2023, 7, 21)
+    write = mocker.spy(src.generator, "write_atomically")
+
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        config: Config = Config.from_dict({**json.load(config_file), "output": str(tmp_path)})
+
+    totals = generate_report(processor, config, _logger)
+    save_qr_code(config, totals)
+    qr_code_mtime = os.path.getmtime(f"{tmp_path}/2023_06/qr_code_2023_6.svg")
+    assert write.call_count == 2
+
+    totals = generate_report(processor, config, _logger)
+    save_qr_code(config, totals)
+    assert write.call_count == 2
+    assert os.path.getmtime(f"{tmp_path}/2023_06/qr_code_2023_6.svg") == qr_code_mtime
+
+    today.return_value = date(2023, 7, 22)
+    generate_report(processor, config, _logger)
+    assert write.call_count == 4
+    assert not filecmp.cmp(f"{tmp_path}/2023_06/dphdp3_2023_6m.xml", "./test_data/dphdp3_2023_6m.xml", shallow=False)
+
+
+def test_should_save_outputs_concurrently(mocker, mocked_invoices, mocked_expenses, tmp_path):
+    processor = _create_processor(mocker)
+
+    _mock_pages(mocker, {"invoices.json": [mocked_invoices], "expenses.json": [mocked_expenses]})
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
+
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        config: Config = Config.from_dict({**json.load(config_file), "output": str(tmp_path)})
+
+    generate_report(processor, config, _logger, qr_code=True)
+
+    assert filecmp.cmp(f"{tmp_path}/2023_06/dphkh1_2023_6m.xml", "./test_data/dphkh1_2023_6m.xml", shallow=False)
+    with open(f"{tmp_path}/2023_06/manifest.json", encoding="utf-8") as f:
+        assert sorted(json.load(f)) == ["dphdp3_2023_6m.xml", "dphkh1_2023_6m.xml", "qr_code_2023_6.svg"]
+    assert not [name for name in os.listdir(f"{tmp_path}/2023_06") if name.startswith(".tmp-")]
+
+
+def test_should_aggregate_generated_periods(mocker, mocked_invoices, mocked_expenses, tmp_path):
+    processor = _create_processor(mocker)
+    _mock_pages(mocker, {"invoices.json": [mocked_invoices], "expenses.json": [mocked_expenses]})
+
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        config: Config = Config.from_dict({**json.load(config_file), "output": str(tmp_path)})
+
+    all_totals = generate_reports(processor, config, Period(2023, 5), Period(2023, 6), _logger)
+
+    totals, _, _ = MonthlyAggregates.from_config(config).totals_between(Period(2023, 1), Period(2023, 12))
+    assert totals.tax_diff == sum(t.tax_diff for t in all_totals.values() if t is not None)
+    assert MonthlyAggregates.from_config(config).periods() == [Period(2023, 5), Period(2023, 6)]
+
+
+def test_should_aggregate_period_only_when_outputs_are_saved(mocker, mocked_invoices, mocked_expenses, tmp_path):
+    processor = _create_processor(mocker)
+    _mock_pages(mocker, {"invoices.json": [mocked_invoices], "expenses.json": [mocked_expenses]})
+    mocker.patch("src.generator._save_qr_code", side_effect=OSError("disk full"))
+
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        config: Config = Config.from_dict({**json.load(config_file), "output": str(tmp_path)})
+
+    with pytest.raises(OSError, match="disk full"):
+        generate_report(processor, config, _logger, qr_code=True)
+
+    assert MonthlyAggregates.from_config(config) is MonthlyAggregates.from_config(config)
+    assert MonthlyAggregates.from_config(config).periods() == []
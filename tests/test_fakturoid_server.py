@@ -0,0 +1,54 @@
+import time
+
+import requests
+
+from fakturoid_server import ServerOptions, serve
+from ledger_generator import SLUG, generate_ledger
+from src.dtos import Period
+from src.fakturoid_processor import FakturoidAuth, FakturoidProcessor
+
+
+def _create_processor(base_url: str, workers: int = 1) -> FakturoidProcessor:
+    return FakturoidProcessor(FakturoidAuth("client_id", "client_secret", "user@example.org", SLUG),
+                              workers=workers, retries=20, backoff=0, base_url=base_url)
+
+
+def test_should_fetch_all_pages_despite_server_errors():
+    invoices, expenses = generate_ledger(900, months=3)
+    options = ServerOptions(error_rate=0.5, latency_jitter=0.002)
+
+    with serve(invoices, expenses, options) as server:
+        fetched = _create_processor(server.base_url, workers=4).process_invoices(Period(2023, 6))
+
+    expected = [i["id"] for i in invoices if i["taxable_fulfillment_due"] >= "2023-06"]
+    assert sorted(i.id for i in fetched) == sorted(expected)
+    assert server.counters[503] > 0
+    assert 401 not in server.counters
+
+
+def test_should_limit_rate():
+    invoices, expenses = generate_ledger(100)
+
+    with serve(invoices, expenses, ServerOptions(page_size=10, rate_limit=3)) as server:
+        processor = _create_processor(server.base_url)
+        url = f"{server.base_url}/accounts/{SLUG}/invoices.json"
+        responses = [requests.get(url, headers=processor._create_headers_with_token()) for _ in range(4)]
+
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert responses[0].headers["X-RateLimit-Policy"] == "default;q=3;w=60"
+    assert responses[2].headers["X-RateLimit"].startswith("default;r=0;")
+    assert int(responses[3].headers["Retry-After"]) > 0
+
+
+def test_should_wait_for_rate_limit_reset():
+    invoices, expenses = generate_ledger(200)
+
+    with serve(invoices, expenses, ServerOptions(rate_limit=2, rate_window=0.5)) as server:
+        started = time.monotonic()
+        fetched = _create_processor(server.base_url).process_invoices(Period(2023, 6))
+        seconds = time.monotonic() - started
+
+    assert len(fetched) == len(invoices)
+    # 6 pages in windows of 2 requests
+    assert seconds >= 1
+    assert 429 not in server.counters
@@ -0,0 +1,17 @@
+import pytest
+
+from src.generator import UnknownVatNumbersError, validate_vat_numbers
+from src.vat_registry import DictVatRegistry
+
+
+def test_should_report_all_unknown_vat_numbers(mocker):
+    invoices = [mocker.Mock(client_vat_number=number) for number in ["CZ1", "CZ2", "CZ3", "CZ2"]]
+    expenses = [mocker.Mock(supplier_vat_number=number) for number in ["CZ4", "CZ5"]]
+
+    with pytest.raises(UnknownVatNumbersError) as error:
+        validate_vat_numbers(invoices, expenses, DictVatRegistry({"CZ1": "Client"}), DictVatRegistry({"CZ4": "Supplier"}))
+
+    assert error.value.clients == {"CZ2", "CZ3"}
+    assert error.value.suppliers == {"CZ5"}
+    assert str(error.value) == "Clients with VAT numbers CZ2, CZ3 not found in valid client VAT numbers. " \
+                               "Suppliers with VAT numbers CZ5 not found in valid supplier VAT numbers."
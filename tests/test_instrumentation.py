@@ -0,0 +1,80 @@
+import json
+import tracemalloc
+from typing import Dict
+
+from src.instrumentation import Collector, Instrumentation
+
+
+class _CountingCollector(Collector):
+
+    def __init__(self):
+        self.started = []
+
+    def start_stage(self, stage: str):
+        self.started.append(stage)
+
+    def end_stage(self, stage: str) -> Dict[str, float]:
+        return {"calls": len(self.started)}
+
+
+def test_should_measure_stages(tmp_path):
+    instrumentation = Instrumentation()
+    collector = _CountingCollector()
+    instrumentation.add_collector(collector)
+
+    with instrumentation.stage("fetch") as metrics:
+        instrumentation.count_request()
+        data = b"".join(instrumentation.count_chunks([b"[1,", b"2]"]))
+        with instrumentation.stage("oauth"):
+            instrumentation.count_request()
+        buffer = bytearray(1024 * 1024)
+        metrics.records = 2
+    del buffer
+
+    oauth, fetch = instrumentation.stages
+    assert data == b"[1,2]"
+    assert (fetch.stage, fetch.requests, fetch.bytes_received, fetch.records) == ("fetch", 2, 5, 2)
+    assert (oauth.stage, oauth.requests, oauth.bytes_received) == ("oauth", 1, 0)
+    assert fetch.peak_memory_bytes >= 1024 * 1024 > oauth.peak_memory_bytes
+    assert fetch.seconds >= oauth.seconds
+    assert collector.started == ["fetch", "oauth"]
+    assert fetch.extra == {"calls": 2}
+
+    json_file_name, prometheus_file_name = instrumentation.write(str(tmp_path), "2023_6m")
+
+    with open(json_file_name, encoding="utf-8") as f:
+        assert [s["stage"] for s in json.load(f)["stages"]] == ["oauth", "fetch"]
+    with open(prometheus_file_name, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert "# TYPE fs_reports_stage_requests gauge" in lines
+    assert 'fs_reports_stage_requests{stage="fetch"} 2' in lines
+    assert 'fs_reports_stage_calls{stage="oauth"} 2' in lines
+
+
+def test_should_not_measure_when_disabled(tmp_path):
+    instrumentation = Instrumentation(enabled=False)
+
+    with instrumentation.stage("fetch") as metrics:
+        instrumentation.count_request()
+        metrics.records = 1
+
+    assert instrumentation.stages == []
+    assert instrumentation.write(str(tmp_path), "2023_6m") == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_should_leave_tracing_started_by_others_running():
+    instrumentation = Instrumentation()
+
+    with instrumentation.stage("first"):
+        pass
+    assert not tracemalloc.is_tracing()
+
+    tracemalloc.start()
+    try:
+        with instrumentation.stage("second") as metrics:
+            data = bytearray(100_000)
+        assert tracemalloc.is_tracing()
+        assert metrics.peak_memory_bytes >= len(data)
+    finally:
+        tracemalloc.stop()
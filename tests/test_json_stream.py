@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from src.json_stream import iter_json_array, iter_json_file
+
+_ITEMS = [{"id": 1, "name": "Žluťoučký kůň", "lines": [{"price": "12.5"}]}, 12345, "a]b", None, [1, [2]], {}]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1000])
+def test_should_parse_items_split_anywhere(chunk_size):
+    data = json.dumps(_ITEMS, ensure_ascii=False, indent=2).encode("utf-8")
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    assert list(iter_json_array(chunks)) == _ITEMS
+
+
+def test_should_parse_empty_array():
+    assert list(iter_json_array([" [ ", " ] "])) == []
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2", "[1, {\"a\": }]"])
+def test_should_reject_invalid_arrays(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array([text]))
+
+
+def test_should_parse_file_lazily(tmp_path):
+    file_name = tmp_path / "expenses.json"
+    file_name.write_text(json.dumps(_ITEMS), encoding="utf-8")
+
+    items = iter_json_file(str(file_name), chunk_size=4)
+
+    assert next(items) == _ITEMS[0]
+    assert list(items) == _ITEMS[1:]
@@ -0,0 +1,50 @@
+import tracemalloc
+
+from src.dtos import Expense
+from src.ledger import compute_control_report, compute_totals
+from tests.documents import make_expense
+
+
+def _expense(subtotal: float, tax: float) -> Expense:
+    return make_expense(subtotal=subtotal, tax=tax, total=round(subtotal + tax, 2))
+
+
+def test_should_compute_exact_totals():
+    invoices = [_expense(100, 21), _expense(1000, 210)]
+    expenses = [_expense(0.1, 0.02)] * 10 + [_expense(0.2, 0.04)] * 5
+
+    totals = compute_totals(invoices, expenses)
+
+    assert (totals.total, totals.subtotal, totals.tax) == (1331, 1100, 231)
+    assert (totals.supplier_total, totals.supplier_subtotal, totals.supplier_tax) == (2.4, 2, 0.4)
+    assert (totals.total_diff, totals.tax_diff) == (1328.6, 230.6)
+    assert isinstance(totals.total, int)
+
+
+def test_should_compute_totals_without_allocating_per_document():
+    expenses = [_expense(8264.46, 1735.54)] * 100_000
+
+    tracemalloc.start()
+    try:
+        # iterators can be walked only once
+        totals = compute_totals(iter(expenses), iter(expenses))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert totals.supplier_total == 1_000_000_000
+    # a table of the amounts alone would take 2.4 MB per list
+    assert peak < 10_000
+
+
+def test_should_sum_documents_up_to_control_report_threshold():
+    boundary, large, just_over = _expense(8264.46, 1735.54), _expense(20000, 4200), _expense(8264.47, 1735.54)
+    expenses = [_expense(100, 21), boundary, _expense(0.1, 0.02), large, _expense(8000, 1680), just_over]
+
+    control_report = compute_control_report([], expenses)
+
+    # a document of exactly 10,000 CZK does not exceed the threshold, so it is summed up
+    assert control_report.expenses == [large, just_over]
+    assert (control_report.small_expenses_subtotal, control_report.small_expenses_tax) == (16364.56, 3436.56)
+    assert (control_report.invoices, control_report.small_invoices_subtotal, control_report.small_invoices_tax) == \
+        ([], 0, 0)
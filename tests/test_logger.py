@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+from src.dtos import Expense, Invoice, Period
+from src.generator import _print_info
+from src.logger import get_logger
+from src.processor import Processor
+from src.vat_registry import DictVatRegistry
+from tests.documents import make_expense, make_invoice
+
+
+class _Formatted:
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.get_ident())
+        return "formatted"
+
+
+def _invoice(id: str, client_vat_number: str) -> Invoice:
+    return make_invoice(id=id, number=id, client_vat_number=client_vat_number)
+
+
+def _expense(id: str, supplier_vat_number: str) -> Expense:
+    return make_expense(id=id, supplier_vat_number=supplier_vat_number, subtotal=10, tax=2.1, total=12.1)
+
+
+def test_should_log_summary_only(caplog):
+    logger = get_logger("tests-summary", level="SUMMARY")
+    invoices = [_invoice("1", "CZ1"), _invoice("2", "CZ1"), _invoice("3", "CZ2")]
+    expenses = [_expense("4", "CZ3")]
+    registry = DictVatRegistry({"CZ1": "Client 1", "CZ2": "Client 2", "CZ3": "Supplier 3"})
+
+    _print_info(logger, Period(2023, 6), invoices, expenses, Processor.generate_totals(invoices, expenses),
+                registry, registry)
+
+    messages = [r.getMessage() for r in caplog.records]
+    assert "Invoices (3) from 2 clients." in messages
+    assert "Expenses (1) from 1 suppliers." in messages
+    assert not [m for m in messages if m.startswith("\t")]
+
+
+def test_should_format_queued_records_in_background():
+    logger = get_logger("tests-queued", level=logging.INFO, queued=True)
+    # pytest handlers of the root logger format propagated records in the calling thread
+    logger.propagate = False
+    filtered, logged = _Formatted(), _Formatted()
+
+    logger.debug("Filtered %s.", filtered)
+    logger.info("Logged %s.", logged)
+
+    deadline = time.monotonic() + 5
+    while not logged.threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert filtered.threads == []
+    assert logged.threads and threading.get_ident() not in logged.threads
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from src.dtos import Expense
+from src.merge import deduplicate, expense_key, merge_documents
+from tests.documents import make_expense
+
+
+def _expense(id: str, day: int, variable_symbol: str = "", original_number: str = "", month: int = 6) -> Expense:
+    return make_expense(id=id, original_number=original_number, supplier_registration_number="12345678",
+                        supplier_vat_number="CZ12345678", taxable_fulfillment_due=datetime(2023, month, day),
+                        variable_symbol=variable_symbol)
+
+
+def test_should_merge_sources_by_taxable_fulfillment_due():
+    fakturoid = [_expense("f2", 20, "2", "O2"), _expense("f1", 10, "1", "O1")]
+    files = [_expense("x1", 10, "1", "O1"), _expense("x3", 5, "3", "O3"), _expense("x4", 25, "4", "O4")]
+
+    merged = merge_documents([fakturoid, files], expense_key)
+
+    assert [e.id for e in merged] == ["x3", "f1", "f2", "x4"]
+
+
+def test_should_keep_expenses_without_original_number():
+    fakturoid = [_expense("a", 1, "8800123456")]
+    files = [_expense("b", 1, "8800123456"), _expense("c", 1, original_number="7")]
+    others = [_expense("d", 2, original_number="7")]
+
+    assert [[e.id for e in s] for s in deduplicate([fakturoid, files, others], expense_key)] == [["a"], ["b", "c"], []]
+
+
+def test_should_keep_recurring_bills_of_single_source():
+    bills = [_expense(f"b{month}", 15, "8800123456", month=month) for month in (4, 5, 6)]
+
+    assert [e.id for e in merge_documents([bills], expense_key)] == ["b4", "b5", "b6"]
+    assert [e.id for e in merge_documents([bills, bills[1:]], expense_key)] == ["b4", "b5", "b5", "b6", "b6"]
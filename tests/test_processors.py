@@ -0,0 +1,70 @@
+import filecmp
+import json
+from datetime import date
+from logging import Logger
+
+import pytest
+
+from src.dtos import Config, Period
+from src.file_processor import FileProcessor
+from src.generator import generate_report
+from src.logger import get_logger
+from src.merged_processor import MergedProcessor
+from src.processors import create_processor
+
+_logger: Logger = get_logger("tests")
+
+
+def _config(**overrides) -> Config:
+    with open("./test_data/config1.json", encoding="utf-8") as config_file:
+        return Config.from_dict({**json.load(config_file), **overrides})
+
+
+def test_should_generate_reports_from_files(mocker, tmp_path):
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
+    config = _config(processor="file", output=str(tmp_path),
+                     file={"invoices": "./test_data/invoices.json", "expenses": "./test_data/expenses.json"})
+
+    processor = create_processor(config)
+    totals = generate_report(processor, config, _logger)
+
+    assert isinstance(processor, FileProcessor)
+    assert totals.tax == 9610
+    assert filecmp.cmp(f"{tmp_path}/2023_06/dphdp3_2023_6m.xml", "./test_data/dphdp3_2023_6m.xml", shallow=False)
+    assert filecmp.cmp(f"{tmp_path}/2023_06/dphkh1_2023_6m.xml", "./test_data/dphkh1_2023_6m.xml", shallow=False)
+
+
+def test_should_reject_unknown_processor():
+    with pytest.raises(ValueError, match="Unknown processor csv, use one of fakturoid, file."):
+        create_processor(_config(processor="csv"))
+
+
+def test_should_merge_processors(mocker, tmp_path):
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
+    config = _config(processors=["file", "file"], output=str(tmp_path),
+                     file={"invoices": "./test_data/invoices.json", "expenses": "./test_data/expenses.json"})
+
+    processor = create_processor(config)
+    invoices, expenses = processor.fetch(config)
+    totals = generate_report(processor, config, _logger)
+
+    assert isinstance(processor, MergedProcessor)
+    assert totals.tax == 9610
+    assert invoices == sorted(invoices, key=lambda i: i.taxable_fulfillment_due)
+    assert len(expenses) == len(FileProcessor.from_config(config).fetch(config)[1])
+
+
+def test_should_keep_recurring_bills_of_single_processor(tmp_path):
+    with open("./test_data/expenses.json", encoding="utf-8") as expenses_file:
+        bill = json.load(expenses_file)[0]
+    bills = [{**bill, "id": month, "original_number": "", "variable_symbol": "8800123456",
+              "issued_on": f"2023-{month:02}-15", "taxable_fulfillment_due": f"2023-{month:02}-15"}
+             for month in (4, 5, 6)]
+    expenses_file_name = tmp_path / "expenses.json"
+    expenses_file_name.write_text(json.dumps(bills), encoding="utf-8")
+    config = _config(processor="file", output=str(tmp_path / "reports"),
+                     file={"invoices": "./test_data/invoices.json", "expenses": str(expenses_file_name)})
+
+    _, expenses = create_processor(config).fetch_between(config, Period(2023, 4), Period(2023, 6))
+
+    assert [e.id for e in expenses] == [4, 5, 6]
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from src.rate_limiter import RateLimiter, _parse_retry_after
+
+
+class _Clock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_should_follow_rate_limit_headers():
+    clock = _Clock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+
+    limiter.acquire()
+    limiter.update(200, {"X-RateLimit-Policy": "default;q=10;w=5", "X-RateLimit": "default;r=1;t=5"})
+    limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.update(200, {"X-RateLimit-Policy": "default;q=10;w=5", "X-RateLimit": "default;r=0;t=4"})
+    limiter.acquire()
+
+    assert clock.now == 4
+    assert limiter.rate == 2
+
+
+def test_should_back_off_after_too_many_requests():
+    clock = _Clock()
+    limiter = RateLimiter(quota=60, window=60, clock=clock, sleep=clock.sleep)
+
+    assert limiter.update(429, {"Retry-After": "3"})
+    limiter.acquire()
+    assert clock.now == 3
+    assert limiter.rate == 0.5
+
+    assert not limiter.update(200, {})
+    assert limiter.rate == 0.55
+
+
+def test_should_parse_retry_after_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert 25 < _parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    assert _parse_retry_after("soon") is None
+
+
+def test_should_not_limit_before_policy():
+    clock = _Clock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+
+    for _ in range(1000):
+        limiter.acquire()
+        limiter.update(200, {})
+
+    assert clock.sleeps == []
+    assert limiter.rate is None
@@ -0,0 +1,72 @@
+import json
+import threading
+from datetime import date
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from src.logger import get_logger
+from src.service import ReportServer, ReportService
+
+
+@pytest.fixture()
+def server(mocker, tmp_path):
+    mocker.patch("src.generator.date").today.return_value = date(2023, 7, 21)
+    with open("./test_data/config1.json", encoding="utf-8") as f:
+        config = {**json.load(f), "processor": "file", "output": str(tmp_path / "reports"),
+                  "file": {"invoices": "./test_data/invoices.json", "expenses": "./test_data/expenses.json"}}
+    config_file = tmp_path / "tenant.json"
+    config_file.write_text(json.dumps(config))
+    # aggregates of a directory cannot be opened
+    broken_config_file = tmp_path / "broken.json"
+    broken_config_file.write_text(json.dumps({**config, "aggregates": str(tmp_path)}))
+
+    service = ReportService([str(config_file), str(broken_config_file)], get_logger("tests"))
+    service.warm_up()
+    server = ReportServer(("127.0.0.1", 0), service, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _call(url: str, method: str = "GET") -> dict:
+    with urlopen(Request(url, method=method, data=b"" if method == "POST" else None), timeout=10) as response:
+        return json.load(response)
+
+
+def test_should_serve_totals_and_reports(server, tmp_path):
+    totals = _call(f"{server.url}/totals?period=2023-06&config=tenant")
+    assert totals["totals"]["tax"] == 9610
+
+    reports = _call(f"{server.url}/reports?period=2023-06", "POST")
+    assert reports["totals"] == totals["totals"]
+    assert reports["report_dir"] == f"{tmp_path}/reports/2023_06"
+    assert (tmp_path / "reports/2023_06/dphkh1_2023_6m.xml").exists()
+    assert reports["qr_code"] == f"{tmp_path}/reports/2023_06/qr_code_2023_6.svg"
+
+
+def test_should_reject_invalid_requests(server):
+    for url, status in [("/totals?period=June", 400), ("/totals?period=2023-06&config=other", 404), ("/dph", 404)]:
+        with pytest.raises(HTTPError) as ex:
+            _call(f"{server.url}{url}")
+        assert ex.value.code == status
+
+
+def test_should_not_save_qr_code_of_period_without_documents(server, tmp_path):
+    qr_code = _call(f"{server.url}/qr?period=2020-01", "POST")
+
+    assert qr_code["invoices"] == 0 and qr_code["expenses"] == 0
+    assert qr_code["qr_code"] is None
+    assert not (tmp_path / "reports/2020_01").exists()
+
+
+def test_should_answer_unexpected_errors(server):
+    with pytest.raises(HTTPError) as ex:
+        _call(f"{server.url}/reports?period=2023-06&config=broken", "POST")
+
+    assert ex.value.code == 500
+    assert json.load(ex.value)["error"].startswith("OperationalError")
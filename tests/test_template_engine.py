@@ -0,0 +1,23 @@
+import os
+
+from src.template_engine import compile_templates, get_template_env
+
+
+def test_should_share_env_and_cache_bytecode(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    env = get_template_env(bytecode_cache_dir=cache_dir)
+
+    assert get_template_env(bytecode_cache_dir=cache_dir) is env
+    env.get_template("dphdp3_template.xml")
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_should_load_precompiled_templates(tmp_path):
+    compiled_dir = str(tmp_path / "compiled")
+    compile_templates(compiled_dir)
+
+    env = get_template_env(bytecode_cache_dir=None, compiled_dir=compiled_dir)
+    template = env.get_template("dphkh1_template.xml")
+
+    assert template.filename.startswith(compiled_dir)
+    assert len(os.listdir(compiled_dir)) == 2
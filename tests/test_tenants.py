@@ -0,0 +1,47 @@
+import json
+
+from src.dtos import Totals
+from src.tenants import TenantResult, find_config_files, format_summary, generate_tenants
+
+
+def test_should_find_config_files(tmp_path):
+    for name in ["b.json", "a.json", "notes.txt"]:
+        (tmp_path / name).write_text("{}")
+
+    assert find_config_files([str(tmp_path), "./other.json"]) == [
+        str(tmp_path / "a.json"),
+        str(tmp_path / "b.json"),
+        "./other.json",
+    ]
+
+
+def test_should_isolate_failed_tenants():
+    results = generate_tenants(["./missing1.json", "./missing2.json"], workers=2)
+
+    assert [r.config_file for r in results] == ["./missing1.json", "./missing2.json"]
+    assert all(r.totals is None and r.error.startswith("FileNotFoundError") for r in results)
+
+
+def test_should_format_summary():
+    summary = format_summary([
+        TenantResult("a.json", Totals(121, 100, 21, 12.1, 10, 2.1, 108.9, 18.9), 1.234),
+        TenantResult("b.json", None, 0.5, "ValueError: boom"),
+    ])
+
+    lines = summary.split("\n")
+    assert lines[0].startswith("Config | Total | Tax")
+    assert [cell.strip() for cell in lines[1].split(" | ")] == ["a.json", "121", "21", "12.1", "2.1", "18.9", "1.23", "OK"]
+    assert lines[2].endswith("| ValueError: boom")
+
+
+def test_should_isolate_tenants_failing_unexpectedly(tmp_path):
+    with open("./test_data/config1.json", encoding="utf-8") as f:
+        config = {**json.load(f), "processor": "file", "output": str(tmp_path / "reports"),
+                  "file": {"invoices": "./test_data/invoices.json", "expenses": "./test_data/expenses.json"}}
+    (tmp_path / "a.json").write_text(json.dumps({**config, "aggregates": str(tmp_path)}))
+    (tmp_path / "b.json").write_text(json.dumps(config))
+
+    results = generate_tenants([str(tmp_path / "a.json"), str(tmp_path / "b.json")], workers=2)
+
+    assert results[0].error.startswith("OperationalError")
+    assert results[1].error is None and results[1].totals.tax == 9610
@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from src.transform import Transformer, constant, identity, parse_amount, parse_date
+
+
+@dataclass
+class _Document:
+    id: str
+    kind: str
+    issued_on: datetime
+    subtotal: int
+    total: int
+    tax: int
+
+
+def test_should_parse_dates():
+    assert parse_date("2023-06-30") == datetime(2023, 6, 30)
+    assert parse_date("2023-06-30") is parse_date("2023-06-30")
+
+
+def test_should_transform_records_by_specs():
+    transformer = Transformer(_Document, {
+        "id": ("number", identity),
+        "kind": (None, constant("invoice")),
+        "issued_on": ("issued_on", parse_date),
+        "subtotal": ("subtotal", parse_amount),
+        "total": ("total", parse_amount),
+    }, {
+        "tax": lambda values: values["total"] - values["subtotal"],
+    })
+
+    documents = transformer([{"number": "2023-001", "issued_on": "2023-06-01", "subtotal": "11232.75", "total": "13591.63"}])
+
+    assert documents == [_Document("2023-001", "invoice", datetime(2023, 6, 1), 11233, 13592, 2359)]
@@ -0,0 +1,36 @@
+import pytest
+
+from src.vat_registry import DictVatRegistry, IndexedVatRegistry, build_index
+
+_NAMES = {f"CZ{number}": f"Company {number}" for number in range(10000, 10500, 7)}
+_NAMES["SK1234"] = "Firma, s.r.o."
+_NAMES["CZ1"] = "Žluťoučký kůň"
+
+
+def test_should_look_up_indexed_numbers(tmp_path):
+    file_name = str(tmp_path / "clients.idx")
+    build_index(_NAMES, file_name)
+
+    registry = IndexedVatRegistry(file_name)
+
+    assert len(registry) == len(_NAMES)
+    assert all(registry.get_name(number) == name for number, name in _NAMES.items())
+    assert registry.get_name("CZ10001") is None
+    assert registry.get_name("") is None
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_should_find_all_unknown_numbers(tmp_path, indexed):
+    file_name = str(tmp_path / "clients.idx")
+    build_index(_NAMES, file_name)
+    registry = IndexedVatRegistry(file_name) if indexed else DictVatRegistry(_NAMES)
+
+    assert registry.find_unknown(["CZ1", "CZ2", "SK1234", "CZ2", None]) == {"CZ2", None}
+
+
+def test_should_reject_other_files(tmp_path):
+    file_name = tmp_path / "clients.json"
+    file_name.write_text("[]")
+
+    with pytest.raises(ValueError):
+        IndexedVatRegistry(str(file_name)).get_name("CZ1")